@@ -0,0 +1,86 @@
+"""Масштабирование ETL по процессам: полный проход каталога силами
+1..N воркеров, каждый со своим разделом film_work.
+
+Каталог должен уже лежать в Postgres (например, после run.py).
+Документы уходят в заглушку Elasticsearch, поэтому измеряется
+сторона ETL: чтение, объединение и подготовка _bulk.
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'postgres_to_es'))
+
+from elasticsearch import Elasticsearch  # noqa: E402
+
+from es_stub import ElasticsearchStub  # noqa: E402
+from config.choices import Tables  # noqa: E402
+from config.partitions import Partition  # noqa: E402
+from config.pg_connection_helpers import pg_connector  # noqa: E402
+from config.serializers import es_serializers  # noqa: E402
+from config.worker import ETLWorker  # noqa: E402
+from main import build_pipeline  # noqa: E402
+from settings import PG_CONF  # noqa: E402
+from state.json_file_storage import JsonFileStorage  # noqa: E402
+from state.models import State, Watermark  # noqa: E402
+
+
+def run_partition(es_url, partition):
+    logging.disable(logging.INFO)
+    es_client = Elasticsearch(es_url, serializers=es_serializers())
+    with tempfile.TemporaryDirectory() as tmp, \
+            pg_connector(PG_CONF) as conn:
+        state = State(JsonFileStorage(os.path.join(tmp, 'state.json')))
+        etl_worker = ETLWorker(conn, partition=partition)
+        producer, _ = build_pipeline(etl_worker, es_client, state)
+        for table in Tables:
+            producer.send((Watermark.initial(), table.value))
+
+
+def bench(stub, workers):
+    stub.documents = 0
+    processes = [multiprocessing.Process(
+        target=run_partition, args=(stub.url, Partition(index, workers)))
+        for index in range(workers)]
+    started = time.perf_counter()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.perf_counter() - started
+    return {'workers': workers,
+            'seconds': round(elapsed, 3),
+            'documents': stub.documents,
+            'docs_per_sec': round(stub.documents / elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--max-workers', type=int,
+                        default=os.cpu_count() or 1)
+    parser.add_argument('--es-latency', type=float, default=0.0)
+    parser.add_argument('--output', default='bench_sharding.json')
+    args = parser.parse_args()
+
+    stub = ElasticsearchStub(latency=args.es_latency).start()
+    try:
+        report = [bench(stub, workers)
+                  for workers in range(1, args.max_workers + 1)]
+    finally:
+        stub.stop()
+    for row in report:
+        row['speedup'] = round(report[0]['seconds'] / row['seconds'], 2)
+    with open(args.output, 'w') as fp:
+        json.dump(report, fp, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""Бенчмарк объединения и преобразования ETL: MovieRow против документа,
+собранного в SQL.
+
+Для каждого режима одни и те же фильмы проходят merge_changes
+и transform_and_send_movies, поэтому в замер входит и запрос
+к Postgres: в режиме sql он дороже, зато Python почти ничего не делает.
+Каталог должен уже лежать в Postgres (например, после run.py).
+Загрузка в Elasticsearch не измеряется.
+"""
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT / 'postgres_to_es'))
+
+from config.pg_connection_helpers import pg_connector, pg_cursor  # noqa: E402
+from config.utils import coroutine  # noqa: E402
+from config.worker import ETLWorker  # noqa: E402
+from settings import NUMBER_OF_FETCHED, PG_CONF  # noqa: E402
+from state.models import Checkpoint  # noqa: E402
+
+MODES = {
+    'pydantic': {'transform': 'pydantic'},
+    'sql': {'transform': 'sql'},
+    'sql-raw': {'transform': 'sql', 'raw_json': True},
+}
+
+
+@coroutine
+def counter(result):
+    while args := (yield):
+        result[0] += len(args[0])
+
+
+def film_ids(conn, films):
+    with pg_cursor(conn) as cursor:
+        cursor.execute('SELECT id FROM content.film_work ORDER BY id '
+                       'LIMIT %s', (films,))
+        return [{'id': row[0]} for row in cursor.fetchall()]
+
+
+def measure(conn, ids, batch_size, validate_sample, **options):
+    """docs/sec объединения и преобразования пачками по batch_size."""
+    worker = ETLWorker(conn, validate_sample=validate_sample, **options)
+    result = [0]
+    transformer = worker.transform_movies(next_node=counter(result))
+    checkpoint = Checkpoint('film_work', None)
+    started = time.perf_counter()
+    for start in range(0, len(ids), batch_size):
+        worker.merge_changes(ids[start:start + batch_size], checkpoint,
+                             transformer)
+    elapsed = time.perf_counter() - started
+    return result[0], elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--films', type=int, default=100_000)
+    parser.add_argument('--batch-size', type=int, default=NUMBER_OF_FETCHED)
+    parser.add_argument('--validate-sample', type=float, default=0.01)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    with pg_connector(PG_CONF) as conn:
+        ids = film_ids(conn, args.films)
+        for mode, options in MODES.items():
+            # Лучший из повторов: первый проход прогревает кэш Postgres.
+            total, elapsed = min(
+                (measure(conn, ids, args.batch_size, args.validate_sample,
+                         **options) for _ in range(args.repeat)),
+                key=lambda result: result[1])
+            print(f'{mode:>9}: {total} docs in {elapsed:.2f}s, '
+                  f'{total / elapsed:,.0f} docs/sec')
+
+
+if __name__ == '__main__':
+    main()
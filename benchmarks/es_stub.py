@@ -0,0 +1,108 @@
+"""Минимальная замена Elasticsearch для замеров ETL.
+
+Принимает запросы создания индекса и _bulk, считает документы и байты,
+но ничего не индексирует — измеряется только сторона ETL.
+Задержка latency имитирует время, которое настоящий кластер тратит
+на индексацию одного _bulk.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ElasticsearchStub(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address=('127.0.0.1', 0), latency=0.0):
+        super().__init__(address, StubHandler)
+        self.latency = latency
+        self.indices = set()
+        self.documents = 0
+        self.bulk_requests = 0
+        self.bulk_bytes = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def send_json(self, status, body=None):
+        payload = json.dumps(body or {}).encode()
+        self.send_response(status)
+        self.send_header('X-Elastic-Product', 'Elasticsearch')
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(payload)
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return self.rfile.read(length) if length else b''
+
+    def index_name(self):
+        return self.path.split('?')[0].strip('/').split('/')[0]
+
+    def do_HEAD(self):
+        self.send_json(200 if self.index_name() in self.server.indices
+                       else 404)
+
+    def do_GET(self):
+        self.send_json(200, {
+            'version': {'number': '8.6.2', 'build_flavor': 'default'},
+            'tagline': 'You Know, for Search',
+        })
+
+    def is_bulk(self):
+        return self.path.split('?')[0].endswith('_bulk')
+
+    def do_PUT(self):
+        if self.is_bulk():
+            self.handle_bulk()
+            return
+        self.read_body()
+        self.server.indices.add(self.index_name())
+        self.send_json(200, {'acknowledged': True,
+                             'index': self.index_name()})
+
+    def do_POST(self):
+        if self.is_bulk():
+            self.handle_bulk()
+            return
+        self.read_body()
+        self.send_json(200, {'acknowledged': True})
+
+    def handle_bulk(self):
+        body = self.read_body()
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        lines = body.splitlines()
+        items = []
+        for action in lines[::2]:
+            op, meta = next(iter(json.loads(action).items()))
+            items.append({op: {'_index': meta.get('_index'),
+                               '_id': meta.get('_id'), 'status': 201,
+                               'result': 'created'}})
+        with self.server.lock:
+            self.server.documents += len(items)
+            self.server.bulk_requests += 1
+            self.server.bulk_bytes += len(body)
+        self.send_json(200, {'took': 0, 'errors': False, 'items': items})
@@ -0,0 +1,197 @@
+"""Генератор синтетического каталога фильмов в формате db.sqlite.
+
+Каталог детерминирован зерном: одинаковые параметры дают одинаковый файл.
+"""
+import argparse
+import random
+import sqlite3
+import uuid
+from contextlib import closing
+from datetime import date, datetime, timedelta
+
+SCHEMA = """
+CREATE TABLE film_work (
+    id TEXT PRIMARY KEY, title TEXT NOT NULL, description TEXT,
+    creation_date DATE, rating FLOAT, type TEXT NOT NULL,
+    created_at timestamp with time zone,
+    updated_at timestamp with time zone
+);
+CREATE TABLE genre (
+    id TEXT PRIMARY KEY, name TEXT NOT NULL, description TEXT,
+    created_at timestamp with time zone,
+    updated_at timestamp with time zone
+);
+CREATE TABLE person (
+    id TEXT PRIMARY KEY, full_name TEXT NOT NULL,
+    created_at timestamp with time zone,
+    updated_at timestamp with time zone
+);
+CREATE TABLE genre_film_work (
+    id TEXT PRIMARY KEY, film_work_id TEXT NOT NULL,
+    genre_id TEXT NOT NULL, created_at timestamp with time zone
+);
+CREATE TABLE person_film_work (
+    id TEXT PRIMARY KEY, film_work_id TEXT NOT NULL,
+    person_id TEXT NOT NULL, role TEXT NOT NULL,
+    created_at timestamp with time zone
+);
+"""
+
+GENRES = (
+    'Action', 'Adventure', 'Animation', 'Biography', 'Comedy', 'Crime',
+    'Documentary', 'Drama', 'Family', 'Fantasy', 'History', 'Horror',
+    'Music', 'Musical', 'Mystery', 'Romance', 'Sci-Fi', 'Short', 'Sport',
+    'Thriller', 'War', 'Western', 'Reality-TV', 'Talk-Show', 'Game-Show',
+    'News',
+)
+FIRST_NAMES = (
+    'John', 'Mary', 'James', 'Anna', 'Robert', 'Olga', 'Michael', 'Elena',
+    'David', 'Sofia', 'Richard', 'Irina', 'Thomas', 'Maria', 'Daniel',
+    'Laura', 'Ivan', 'Emma', 'George', 'Alice', 'Peter', 'Nina',
+)
+LAST_NAMES = (
+    'Smith', 'Johnson', 'Brown', 'Taylor', 'Anderson', 'Ivanov', 'Petrova',
+    'Miller', 'Wilson', 'Moore', 'Clark', 'Lewis', 'Walker', 'Hall',
+    'Young', 'King', 'Wright', 'Scott', 'Green', 'Baker', 'Adams', 'Nelson',
+)
+WORDS = (
+    'star', 'night', 'war', 'love', 'city', 'last', 'dark', 'return',
+    'empire', 'secret', 'journey', 'shadow', 'king', 'dream', 'storm',
+    'wars', 'river', 'galaxy', 'ghost', 'island', 'lost', 'fire', 'iron',
+    'silent', 'golden', 'edge', 'heart', 'road', 'winter', 'legend',
+)
+EPOCH = datetime(2021, 6, 16, 20, 14, 9)
+
+
+class CatalogGenerator:
+
+    def __init__(self, films, persons, genres, actors, directors, writers,
+                 seed):
+        self.films = films
+        self.persons = persons
+        self.genres = min(genres, len(GENRES))
+        self.fan_out = {'actor': actors, 'director': directors,
+                        'writer': writers}
+        self.rng = random.Random(seed)
+
+    def uuid(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def timestamp(self):
+        moment = EPOCH + timedelta(seconds=self.rng.randrange(10 ** 7))
+        return f'{moment:%Y-%m-%d %H:%M:%S.%f}+00'
+
+    def timestamps(self):
+        created = EPOCH + timedelta(seconds=self.rng.randrange(10 ** 7))
+        updated = created + timedelta(seconds=self.rng.randrange(10 ** 6))
+        return (f'{created:%Y-%m-%d %H:%M:%S.%f}+00',
+                f'{updated:%Y-%m-%d %H:%M:%S.%f}+00')
+
+    def popular(self, population):
+        # Смещение к началу списка: немногие персоны встречаются часто.
+        return population[int(len(population) * self.rng.random() ** 3)]
+
+    def title(self):
+        words = self.rng.sample(WORDS, self.rng.randint(1, 4))
+        return ' '.join(words).title()
+
+    def genre_rows(self):
+        for name in GENRES[:self.genres]:
+            yield (self.uuid(), name, f'{name} movies', *self.timestamps())
+
+    def person_rows(self):
+        for _ in range(self.persons):
+            full_name = (f'{self.rng.choice(FIRST_NAMES)} '
+                         f'{self.rng.choice(LAST_NAMES)}')
+            yield self.uuid(), full_name, *self.timestamps()
+
+    def film_rows(self):
+        for _ in range(self.films):
+            rating = min(max(self.rng.gauss(6.5, 1.5), 0), 10)
+            yield (
+                self.uuid(), self.title(),
+                ' '.join(self.rng.choices(WORDS, k=self.rng.randint(5, 40))),
+                (date(1950, 1, 1)
+                 + timedelta(days=self.rng.randrange(27000))).isoformat(),
+                round(rating, 1),
+                'movie' if self.rng.random() < 0.8 else 'tv_show',
+                *self.timestamps(),
+            )
+
+    def link_rows(self, film_ids, genre_ids, person_ids):
+        genre_links, person_links = [], []
+        for film_id in film_ids:
+            for genre_id in self.rng.sample(
+                    genre_ids, min(self.rng.randint(1, 3), len(genre_ids))):
+                genre_links.append((self.uuid(), film_id, genre_id,
+                                    self.timestamp()))
+            for role, mean in self.fan_out.items():
+                count = max(0, round(self.rng.expovariate(1 / mean))
+                            if mean else 0)
+                chosen = dict.fromkeys(self.popular(person_ids)
+                                       for _ in range(count))
+                for person_id in chosen:
+                    person_links.append((self.uuid(), film_id, person_id,
+                                         role, self.timestamp()))
+        return genre_links, person_links
+
+    def write(self, path):
+        with closing(sqlite3.connect(path)) as conn:
+            conn.executescript(SCHEMA)
+            genres = list(self.genre_rows())
+            persons = list(self.person_rows())
+            films = list(self.film_rows())
+            conn.executemany('INSERT INTO genre VALUES (?, ?, ?, ?, ?)',
+                             genres)
+            conn.executemany('INSERT INTO person VALUES (?, ?, ?, ?)',
+                             persons)
+            conn.executemany(
+                'INSERT INTO film_work VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                films)
+            genre_links, person_links = self.link_rows(
+                [row[0] for row in films], [row[0] for row in genres],
+                [row[0] for row in persons])
+            conn.executemany(
+                'INSERT INTO genre_film_work VALUES (?, ?, ?, ?)',
+                genre_links)
+            conn.executemany(
+                'INSERT INTO person_film_work VALUES (?, ?, ?, ?, ?)',
+                person_links)
+            conn.commit()
+        return {
+            'film_work': len(films),
+            'genre': len(genres),
+            'person': len(persons),
+            'genre_film_work': len(genre_links),
+            'person_film_work': len(person_links),
+        }
+
+
+def add_arguments(parser):
+    parser.add_argument('--films', type=int, default=10000)
+    parser.add_argument('--persons', type=int, default=5000)
+    parser.add_argument('--genres', type=int, default=len(GENRES))
+    parser.add_argument('--actors', type=float, default=6,
+                        help='среднее число актёров на фильм')
+    parser.add_argument('--directors', type=float, default=1)
+    parser.add_argument('--writers', type=float, default=2)
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def generate(path, args):
+    return CatalogGenerator(args.films, args.persons, args.genres,
+                            args.actors, args.directors, args.writers,
+                            args.seed).write(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path', nargs='?', default='db.sqlite')
+    add_arguments(parser)
+    args = parser.parse_args()
+    for table, rows in generate(args.path, args).items():
+        print(f'{table}: {rows}')
+
+
+if __name__ == '__main__':
+    main()
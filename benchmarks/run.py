@@ -0,0 +1,211 @@
+"""Сквозной бенчмарк: генерация каталога, загрузка SQLite→Postgres,
+полный проход ETL в заглушку Elasticsearch и задержки API.
+
+Результат пишется в JSON, который удобно сравнивать между запусками.
+Параметры подключения к Postgres берутся из тех же переменных окружения,
+что и у postgres_to_es (DB_NAME, POSTGRES_USER, ...).
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import closing
+from datetime import datetime
+from pathlib import Path
+from urllib.request import urlopen
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(ROOT / 'sqlite_to_postgres'), str(ROOT / 'postgres_to_es')]
+
+import psycopg2  # noqa: E402
+from elasticsearch import Elasticsearch  # noqa: E402
+
+import generate_catalog  # noqa: E402
+from es_stub import ElasticsearchStub  # noqa: E402
+from load_data import copy_from_sqlite, load_from_sqlite  # noqa: E402
+
+from config.choices import Tables  # noqa: E402
+from config.pg_connection_helpers import pg_connector  # noqa: E402
+from config.serializers import es_serializers  # noqa: E402
+from config.stages import ThreadedStage  # noqa: E402
+from config.utils import create_index_if_not_exists  # noqa: E402
+from config.worker import ETLWorker  # noqa: E402
+from main import build_pipeline  # noqa: E402
+from settings import INDEX_NAME, PG_CONF  # noqa: E402
+from state.json_file_storage import JsonFileStorage  # noqa: E402
+from state.models import State, Watermark  # noqa: E402
+
+CONTENT_TABLES = ('film_work', 'genre', 'person',
+                  'genre_film_work', 'person_film_work')
+
+
+def percentiles(samples):
+    if len(samples) < 2:
+        return {'count': len(samples)}
+    cuts = statistics.quantiles(samples, n=100)
+    return {
+        'count': len(samples),
+        'mean_ms': round(statistics.fmean(samples) * 1000, 3),
+        'p50_ms': round(cuts[49] * 1000, 3),
+        'p90_ms': round(cuts[89] * 1000, 3),
+        'p99_ms': round(cuts[98] * 1000, 3),
+    }
+
+
+def sqlite_counts(path):
+    with closing(sqlite3.connect(path)) as conn:
+        return {table: conn.execute(f'SELECT COUNT(*) FROM {table}')
+                .fetchone()[0] for table in CONTENT_TABLES}
+
+
+def reset_postgres(dsl):
+    with closing(psycopg2.connect(**dsl)) as conn, conn.cursor() as cursor:
+        cursor.execute('TRUNCATE ' + ', '.join(
+            f'content.{table}' for table in CONTENT_TABLES) + ' CASCADE')
+        cursor.execute(
+            'DROP TABLE IF EXISTS public.sqlite_load_checkpoint')
+        conn.commit()
+
+
+def bench_load(path, dsl, mode, rows):
+    total = sum(sqlite_counts(path).values())
+    started = time.perf_counter()
+    if mode == 'copy':
+        copy_from_sqlite(dsl, path=path)
+    else:
+        with closing(sqlite3.connect(path)) as sqlite_conn, \
+                closing(psycopg2.connect(**dsl)) as pg_conn:
+            load_from_sqlite(sqlite_conn, pg_conn, rows, path)
+    elapsed = time.perf_counter() - started
+    return {'mode': mode, 'rows_mode': rows, 'rows': total,
+            'seconds': round(elapsed, 3),
+            'rows_per_sec': round(total / elapsed)}
+
+
+def bench_etl(dsl, concurrent=False, queue_size=8, es_latency=0.0,
+              transform='sql', raw_json=False):
+    stub = ElasticsearchStub(latency=es_latency).start()
+    stages = ()
+    if concurrent:
+        stages = (ThreadedStage('transform', queue_size),
+                  ThreadedStage('load', queue_size))
+    try:
+        es_client = Elasticsearch(stub.url, serializers=es_serializers())
+        create_index_if_not_exists(
+            es_client, index_path=str(ROOT / 'postgres_to_es' / 'config'
+                                      / 'schema.json'),
+            index_name=INDEX_NAME)
+        with tempfile.TemporaryDirectory() as tmp, pg_connector(dsl) as conn:
+            state = State(JsonFileStorage(os.path.join(tmp, 'state.json')))
+            etl_worker = ETLWorker(conn, transform=transform,
+                                   raw_json=raw_json)
+            producer, _ = build_pipeline(etl_worker, es_client, state,
+                                         stages)
+            started = time.perf_counter()
+            for table in Tables:
+                producer.send((Watermark.initial(), table.value))
+            for stage in stages:
+                stage.join()
+            elapsed = time.perf_counter() - started
+        return {'transform': transform,
+                'raw_json': etl_worker.raw_json,
+                'concurrent': concurrent,
+                'es_latency': es_latency,
+                'seconds': round(elapsed, 3),
+                'documents': stub.documents,
+                'bulk_requests': stub.bulk_requests,
+                'bulk_bytes': stub.bulk_bytes,
+                'docs_per_sec': round(stub.documents / elapsed)}
+    finally:
+        stub.stop()
+
+
+def timed_get(url):
+    started = time.perf_counter()
+    with urlopen(url) as response:
+        body = response.read()
+    return time.perf_counter() - started, body
+
+
+def bench_api(api_url, requests):
+    api_url = api_url.rstrip('/') + '/'
+    list_samples, detail_samples, ids = [], [], []
+    for i in range(requests):
+        elapsed, body = timed_get(f'{api_url}?page={i % 20 + 1}')
+        list_samples.append(elapsed)
+        ids.extend(movie['id'] for movie in json.loads(body)['results'])
+    for movie_id in ids[:requests]:
+        elapsed, _ = timed_get(f'{api_url}{movie_id}/')
+        detail_samples.append(elapsed)
+    return {'list': percentiles(list_samples),
+            'detail': percentiles(detail_samples)}
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    generate_catalog.add_arguments(parser)
+    parser.add_argument('--sqlite', default='bench_catalog.sqlite',
+                        help='путь к каталогу; создаётся, если его нет')
+    parser.add_argument('--load-mode', choices=('insert', 'copy'),
+                        default='insert')
+    parser.add_argument('--rows', choices=('dataclass', 'tuple'),
+                        default='dataclass')
+    parser.add_argument('--reset', action='store_true',
+                        help='очистить таблицы content перед загрузкой')
+    parser.add_argument('--etl-concurrent', action='store_true',
+                        help='преобразование и загрузка в отдельных потоках')
+    parser.add_argument('--etl-queue-size', type=int, default=8)
+    parser.add_argument('--etl-transform', choices=('sql', 'pydantic'),
+                        default='sql',
+                        help='где собирается документ ES')
+    parser.add_argument('--etl-raw-json', action='store_true',
+                        help='документы уходят в _bulk текстом из Postgres')
+    parser.add_argument('--es-latency', type=float, default=0.0,
+                        help='задержка заглушки ES на каждый _bulk, сек')
+    parser.add_argument('--api-url',
+                        help='например http://127.0.0.1/api/v1/movies/')
+    parser.add_argument('--api-requests', type=int, default=200)
+    parser.add_argument('--output', default='bench_report.json')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.sqlite):
+        generate_catalog.generate(args.sqlite, args)
+
+    report = {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'catalog': sqlite_counts(args.sqlite),
+    }
+    if args.reset:
+        reset_postgres(PG_CONF)
+    report['load'] = bench_load(args.sqlite, PG_CONF, args.load_mode,
+                                args.rows)
+    report['etl'] = bench_etl(PG_CONF, args.etl_concurrent,
+                              args.etl_queue_size, args.es_latency,
+                              args.etl_transform, args.etl_raw_json)
+    if args.api_url:
+        report['api'] = bench_api(args.api_url, args.api_requests)
+
+    with open(args.output, 'w') as fp:
+        json.dump(report, fp, indent=2)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
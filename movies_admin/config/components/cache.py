@@ -0,0 +1,12 @@
+import os
+
+
+MOVIES_API_CACHE = {
+    'BACKEND': os.getenv('MOVIES_API_CACHE_BACKEND', default='lru'),
+    'MAX_SIZE': int(os.getenv('MOVIES_API_CACHE_MAX_SIZE', default=1024)),
+    'ALIAS': os.getenv('MOVIES_API_CACHE_ALIAS', default='default'),
+    'TIMEOUT': int(os.getenv('MOVIES_API_CACHE_TIMEOUT', default=300)),
+    # Заголовки X-Cache* с попаданием и счётчиками процесса, для отладки.
+    'DEBUG_HEADERS': os.getenv('MOVIES_API_CACHE_DEBUG_HEADERS',
+                               default='False') == 'True',
+}
@@ -13,6 +13,7 @@ SECRET_KEY = os.getenv('MY_SECRET_KEY')
 
 include(
     'components/database.py',
+    'components/cache.py',
 )
 
 DEBUG = os.environ.get('DEBUG', False) == 'False'
@@ -94,3 +95,7 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 LOCALE_PATHS = ['movies/locale']
+
+MOVIES_API_READ_MODEL = os.getenv('MOVIES_API_READ_MODEL', 'False') == 'True'
+
+TEST_RUNNER = 'config.test_runner.ContentSchemaTestRunner'
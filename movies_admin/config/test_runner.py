@@ -0,0 +1,23 @@
+from django.apps import apps
+from django.db import connections
+from django.db.models.signals import pre_migrate
+from django.test.runner import DiscoverRunner
+
+
+def create_content_schema(using, **kwargs):
+    with connections[using].cursor() as cursor:
+        cursor.execute('CREATE SCHEMA IF NOT EXISTS content')
+
+
+class ContentSchemaTestRunner(DiscoverRunner):
+    """Таблицы приложения живут в схеме content. На рабочей базе её
+    создаёт init.sql, а в чистой тестовой базе — этот раннер перед
+    миграциями."""
+
+    def setup_databases(self, **kwargs):
+        movies = apps.get_app_config('movies')
+        pre_migrate.connect(create_content_schema, sender=movies)
+        try:
+            return super().setup_databases(**kwargs)
+        finally:
+            pre_migrate.disconnect(create_content_schema, sender=movies)
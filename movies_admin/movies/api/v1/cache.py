@@ -0,0 +1,143 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+
+# Свежесть таблиц фильмов, персон, жанров и связей между ними плюс
+# счётчик вставок, изменений и удалений строк этих таблиц. Счётчик ловит
+# то, чего не видит MAX: удаление строк, смену роли персоны и замену
+# связанной персоны на более старую. Точный COUNT(*) стоил бы полного
+# прохода по связям на каждый запрос, а pg_stat_user_tables читается
+# сразу; статистика приходит с задержкой не больше нескольких секунд.
+# Ответы из витрины film_work_read меняются позже источников, при её
+# обновлении: тогда в версию входят и её отметка, и её счётчик.
+VERSION_SQL = '''
+SELECT GREATEST(
+    (SELECT MAX(updated_at) FROM content.film_work),
+    (SELECT MAX(updated_at) FROM content.person),
+    (SELECT MAX(updated_at) FROM content.genre),
+    (SELECT MAX(created_at) FROM content.person_film_work),
+    (SELECT MAX(created_at) FROM content.genre_film_work)
+), (
+    SELECT SUM(n_tup_ins + n_tup_upd + n_tup_del)
+    FROM pg_stat_user_tables
+    WHERE schemaname = 'content' AND relname = ANY(%(tables)s::name[])
+), (
+    SELECT MAX(source_updated_at) FROM content.film_work_read
+    WHERE %(read_model)s
+)
+'''
+CONTENT_TABLES = ('film_work', 'person', 'genre',
+                  'person_film_work', 'genre_film_work')
+
+
+class BaseResponseCache:
+    """Кэш готовых JSON-ответов API со счётчиками попаданий.
+
+    Свежесть держит только версия в ключе: сброс из одного процесса
+    (сигнала, команды, воркера gunicorn) не дошёл бы до LRU-кэшей
+    остальных, поэтому его нет.
+    """
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def version(self):
+        read_model = settings.MOVIES_API_READ_MODEL
+        tables = list(CONTENT_TABLES)
+        if read_model:
+            tables.append('film_work_read')
+        with connection.cursor() as cursor:
+            cursor.execute(VERSION_SQL, {'tables': tables,
+                                         'read_model': read_model})
+            stamp, changes, projected = cursor.fetchone()
+        return f'{stamp}:{changes}:{projected}'
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def clear(self):
+        """Очищает хранилище целиком; нужен тестам."""
+        raise NotImplementedError
+
+
+class LRUResponseCache(BaseResponseCache):
+    """Локальный для процесса LRU-кэш с ограничением по числу ключей."""
+
+    def __init__(self, timeout, max_size):
+        super().__init__(timeout)
+        self.max_size = max_size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            try:
+                expires_at, value = self._data[key]
+            except KeyError:
+                return None
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class DjangoResponseCache(BaseResponseCache):
+    """Кэш поверх бэкенда из settings.CACHES, общий для всех процессов."""
+
+    def __init__(self, timeout, alias):
+        super().__init__(timeout)
+        self.cache = caches[alias]
+
+    def _get(self, key):
+        return self.cache.get(key)
+
+    def set(self, key, value):
+        self.cache.set(key, value, self.timeout)
+
+    def clear(self):
+        self.cache.clear()
+
+
+_response_cache = None
+
+
+def get_response_cache():
+    global _response_cache
+    if _response_cache is None:
+        conf = settings.MOVIES_API_CACHE
+        if conf['BACKEND'] == 'django':
+            _response_cache = DjangoResponseCache(conf['TIMEOUT'],
+                                                  conf['ALIAS'])
+        else:
+            _response_cache = LRUResponseCache(conf['TIMEOUT'],
+                                               conf['MAX_SIZE'])
+    return _response_cache
@@ -0,0 +1,74 @@
+import calendar
+import hashlib
+
+from django.conf import settings
+from django.db import connection
+from django.utils.http import quote_etag
+
+# Свежесть фильмов, их персон, жанров и связей плюс хеш самих связей:
+# смена роли или замена персоны на более старую не трогают ни одну
+# из дат, но меняют хеш. Если ответ собран из витрины film_work_read,
+# к ним добавляются её отметка по этим фильмам и счётчик её строк:
+# витрина обновляется позже источников и тоже должна менять ETag.
+VALIDATORS_SQL = '''
+SELECT
+    GREATEST(
+        (SELECT MAX(updated_at) FROM content.film_work
+         WHERE id = ANY(%(ids)s::uuid[])),
+        (SELECT MAX(p.updated_at)
+         FROM content.person_film_work pfw
+         JOIN content.person p ON p.id = pfw.person_id
+         WHERE pfw.film_work_id = ANY(%(ids)s::uuid[])),
+        (SELECT MAX(g.updated_at)
+         FROM content.genre_film_work gfw
+         JOIN content.genre g ON g.id = gfw.genre_id
+         WHERE gfw.film_work_id = ANY(%(ids)s::uuid[])),
+        (SELECT MAX(created_at) FROM content.person_film_work
+         WHERE film_work_id = ANY(%(ids)s::uuid[])),
+        (SELECT MAX(created_at) FROM content.genre_film_work
+         WHERE film_work_id = ANY(%(ids)s::uuid[]))
+    ),
+    (SELECT md5(string_agg(
+         film_work_id || ':' || person_id || ':' || role, ','
+         ORDER BY film_work_id, person_id, role))
+     FROM content.person_film_work
+     WHERE film_work_id = ANY(%(ids)s::uuid[])),
+    (SELECT md5(string_agg(
+         film_work_id || ':' || genre_id, ','
+         ORDER BY film_work_id, genre_id))
+     FROM content.genre_film_work
+     WHERE film_work_id = ANY(%(ids)s::uuid[])),
+    (SELECT MAX(source_updated_at) FROM content.film_work_read
+     WHERE %(read_model)s AND id = ANY(%(ids)s::uuid[])),
+    (SELECT n_tup_ins + n_tup_upd + n_tup_del
+     FROM pg_stat_user_tables
+     WHERE %(read_model)s
+       AND schemaname = 'content' AND relname = 'film_work_read')
+'''
+
+
+def film_works_validators(ids, extra=''):
+    """Возвращает ETag и Last-Modified для набора фильмов без агрегации
+    самих данных: по свежести фильмов, их персон, жанров и связей
+    и по составу связей. Для витрины Last-Modified — её отметка:
+    ответ отражает источники на момент её обновления."""
+    ids = list(ids)
+    read_model = settings.MOVIES_API_READ_MODEL
+    with connection.cursor() as cursor:
+        cursor.execute(VALIDATORS_SQL, {'ids': ids,
+                                        'read_model': read_model})
+        (last_modified, persons, genres,
+         projected, projection_changes) = cursor.fetchone()
+
+    digest = hashlib.md5(usedforsecurity=False)
+    digest.update(f'{extra}|{last_modified}|{persons}|{genres}|'
+                  f'{projected}|{projection_changes}|'.encode())
+    for pk in ids:
+        digest.update(str(pk).encode())
+
+    if read_model:
+        last_modified = projected
+
+    if last_modified is not None:
+        last_modified = calendar.timegm(last_modified.utctimetuple())
+    return quote_etag(digest.hexdigest()), last_modified
@@ -0,0 +1,73 @@
+import json
+import uuid
+from datetime import date
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BUFFER_SIZE = 64 * 1024
+
+
+def _default(value):
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+if orjson is not None:
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj)
+else:
+    _encoder = json.JSONEncoder(default=_default, separators=(',', ':'))
+
+    def dumps(obj) -> bytes:
+        return _encoder.encode(obj).encode()
+
+
+def _buffered(chunks):
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= BUFFER_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def _iter_json_object(context, results):
+    head = dumps(context)[:-1]
+    yield head + (b',"results":[' if context else b'"results":[')
+    for i, row in enumerate(results):
+        yield b',' + dumps(row) if i else dumps(row)
+    yield b']}'
+
+
+def _iter_json_array(rows):
+    yield b'['
+    for i, row in enumerate(rows):
+        yield b',' + dumps(row) if i else dumps(row)
+    yield b']'
+
+
+def _iter_ndjson(rows):
+    for row in rows:
+        yield dumps(row) + b'\n'
+
+
+def stream_json(context):
+    context = dict(context)
+    results = context.pop('results')
+    return _buffered(_iter_json_object(context, results))
+
+
+def stream_json_array(rows):
+    return _buffered(_iter_json_array(rows))
+
+
+def stream_ndjson(rows):
+    return _buffered(_iter_ndjson(rows))
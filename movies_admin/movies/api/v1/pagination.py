@@ -0,0 +1,80 @@
+import base64
+import binascii
+import json
+import uuid
+
+from django.http import Http404
+
+
+class KeysetPaginator:
+    """Постраничная выборка по ключу (seek) без COUNT(*) и OFFSET.
+
+    Курсор — непрозрачный токен с последним увиденным значением ключа
+    и направлением, в котором нужно продолжить выборку.
+    """
+
+    NEXT = 'next'
+    PREV = 'prev'
+    # Тип значения ключа: курсор из запроса приводится к нему, чтобы
+    # подделанный токен не доходил до фильтра по id.
+    key_type = uuid.UUID
+
+    def __init__(self, queryset, per_page, key='id'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.key = key
+
+    @staticmethod
+    def encode_cursor(value, direction):
+        payload = json.dumps({'v': str(value), 'd': direction})
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    @classmethod
+    def decode_cursor(cls, token):
+        if not token:
+            return None, cls.NEXT
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+            value, direction = payload['v'], payload['d']
+            if value is not None:
+                value = cls.key_type(value)
+        except (binascii.Error, ValueError, KeyError, TypeError,
+                AttributeError):
+            raise Http404('Invalid cursor')
+        if direction not in (cls.NEXT, cls.PREV):
+            raise Http404('Invalid cursor')
+        if value is None and direction == cls.PREV:
+            raise Http404('Invalid cursor')
+        return value, direction
+
+    def paginate(self, token):
+        value, direction = self.decode_cursor(token)
+        queryset = self.queryset
+        if direction == self.NEXT:
+            if value is not None:
+                queryset = queryset.filter(**{f'{self.key}__gt': value})
+            queryset = queryset.order_by(self.key)
+        else:
+            queryset = queryset.filter(
+                **{f'{self.key}__lt': value}).order_by(f'-{self.key}')
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == self.PREV:
+            rows.reverse()
+
+        if not rows:
+            return [], None, None
+
+        first, last = rows[0][self.key], rows[-1][self.key]
+        if direction == self.NEXT:
+            has_next, has_prev = has_more, value is not None
+        else:
+            has_next, has_prev = True, has_more
+
+        return (
+            rows,
+            self.encode_cursor(first, self.PREV) if has_prev else None,
+            self.encode_cursor(last, self.NEXT) if has_next else None,
+        )
@@ -1,11 +1,19 @@
-from django.contrib.postgres.aggregates import ArrayAgg
-from django.db.models import Q
-from django.http import JsonResponse
+from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.http import (HttpResponse, HttpResponseBadRequest, JsonResponse,
+                         StreamingHttpResponse)
 
 from django.views.generic.list import BaseListView
 from django.views.generic.detail import BaseDetailView
 
-from movies.models import Filmwork, FilmRole
+from movies.api.v1.cache import get_response_cache
+from movies.api.v1.conditional import film_works_validators
+from movies.api.v1.encoders import (stream_json, stream_json_array,
+                                    stream_ndjson)
+from movies.api.v1.pagination import KeysetPaginator
+from movies.models import Filmwork, FilmworkRead
+from movies.read_model import aggregated_filmworks, read_filmworks
 
 
 class MoviesApiMixin:
@@ -14,48 +22,151 @@ class MoviesApiMixin:
     paginate_by = 50
 
     def get_queryset(self):
-        queryset = Filmwork.objects.annotate(
-            actors=ArrayAgg('persons__full_name',
-                            distinct=True, filter=Q(
-                                personfilmwork__role=FilmRole.ACTOR)),
-            directors=ArrayAgg('persons__full_name',
-                               distinct=True, filter=Q(
-                                   personfilmwork__role=FilmRole.DIRECTOR)),
-            writers=ArrayAgg('persons__full_name',
-                             distinct=True, filter=Q(
-                                 personfilmwork__role=FilmRole.WRITER)),
-        ).values(
-            'id', 'title', 'description', 'creation_date',
-            'rating', 'type', 'actors', 'writers', 'directors'
-        ).annotate(
-            genres=ArrayAgg('genres__name', distinct=True),
-        )
+        if settings.MOVIES_API_READ_MODEL:
+            return read_filmworks()
+        return aggregated_filmworks()
+
+    def get_ids_queryset(self):
+        if settings.MOVIES_API_READ_MODEL:
+            return FilmworkRead.objects.values('id')
+        return Filmwork.objects.values('id')
+
+    def get(self, request, *args, **kwargs):
+        ids, extra = self.get_validated_ids()
+        etag, last_modified = film_works_validators(ids, extra)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = self.get_response(request, *args, **kwargs)
+
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+        return response
+
+    def get_validated_ids(self):
+        """id фильмов ответа и добавка к ETag. По умолчанию ответ
+        про один фильм из URL; списки переопределяют метод."""
+        return [self.kwargs['pk']], ''
+
+    def get_response(self, request, *args, **kwargs):
+        if not self.is_cacheable():
+            return super().get(request, *args, **kwargs)
+
+        cache = get_response_cache()
+        key = self.get_cache_key(cache.version())
+        content = cache.get(key)
+        if content is None:
+            response = super().get(request, *args, **kwargs)
+            cache.set(key, response.content)
+        else:
+            response = HttpResponse(content,
+                                    content_type='application/json')
 
-        return queryset
+        if settings.MOVIES_API_CACHE['DEBUG_HEADERS']:
+            response['X-Cache'] = 'MISS' if content is None else 'HIT'
+            response['X-Cache-Hits'] = cache.hits
+            response['X-Cache-Misses'] = cache.misses
+        return response
+
+    def is_cacheable(self):
+        return True
+
+    def get_cache_key(self, version):
+        query = self.request.GET.urlencode()
+        return f'movies:api:{version}:{self.request.path}?{query}'
 
     def render_to_response(self, context, **response_kwargs):
         return JsonResponse(context)
 
 
 class MoviesListApi(MoviesApiMixin, BaseListView):
+    cursor_kwarg = 'cursor'
+    stream_kwarg = 'stream'
+    chunk_size = 2000
 
-    def get_context_data(self, *, object_list=None, **kwargs):
-        queryset = self.get_queryset()
-        paginator, page, queryset, is_paginated = self.paginate_queryset(
-            queryset,
+    def is_streaming(self):
+        return self.stream_kwarg in self.request.GET
+
+    def is_cacheable(self):
+        return not self.is_streaming()
+
+    def get_page(self):
+        if not hasattr(self, 'page_info'):
+            if self.cursor_kwarg in self.request.GET:
+                self.page_info = self.get_cursor_page()
+            else:
+                self.page_info = self.get_numbered_page()
+        return self.page_info
+
+    def get_numbered_page(self):
+        paginator, page, page_rows, is_paginated = self.paginate_queryset(
+            self.get_ids_queryset().order_by('id'),
             self.paginate_by
         )
 
-        context = {
+        meta = {
             'count': paginator.count,
             'total_pages': paginator.num_pages,
             'prev': (page.previous_page_number()
                      if page.has_previous() else None),
             'next': page.next_page_number() if page.has_next() else None,
-            'results': list(queryset)
         }
+        return meta, [row['id'] for row in page_rows]
+
+    def get_cursor_page(self):
+        paginator = KeysetPaginator(self.get_ids_queryset(),
+                                    self.paginate_by)
+        page_rows, prev_cursor, next_cursor = paginator.paginate(
+            self.request.GET.get(self.cursor_kwarg)
+        )
+
+        meta = {
+            'prev': prev_cursor,
+            'next': next_cursor,
+        }
+        return meta, [row['id'] for row in page_rows]
+
+    def get_validated_ids(self):
+        meta, ids = self.get_page()
+        return ids, f'{meta}|{self.is_streaming()}'
+
+    def get_context_data(self, *, object_list=None, **kwargs):
+        meta, ids = self.get_page()
+        return {**meta, 'results': self.get_results(ids)}
+
+    def get_results(self, ids):
+        if self.is_streaming():
+            return self.get_queryset().filter(id__in=ids).order_by(
+                'id').iterator(chunk_size=self.chunk_size)
+        rows = {row['id']: row
+                for row in self.get_queryset().filter(id__in=ids)}
+        return [rows[pk] for pk in ids if pk in rows]
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.is_streaming():
+            return StreamingHttpResponse(stream_json(context),
+                                         content_type='application/json')
+        return super().render_to_response(context, **response_kwargs)
+
+
+class MoviesExportApi(MoviesApiMixin, BaseListView):
+    chunk_size = 2000
+    formats = {
+        'ndjson': (stream_ndjson, 'application/x-ndjson'),
+        'json': (stream_json_array, 'application/json'),
+    }
+
+    def get(self, request, *args, **kwargs):
+        try:
+            encoder, content_type = self.formats[
+                request.GET.get('format', 'ndjson')]
+        except KeyError:
+            return HttpResponseBadRequest('Unsupported export format')
 
-        return context
+        rows = self.get_queryset().order_by('id').iterator(
+            chunk_size=self.chunk_size)
+        return StreamingHttpResponse(encoder(rows), content_type=content_type)
 
 
 class MoviesDetailApi(MoviesApiMixin, BaseDetailView):
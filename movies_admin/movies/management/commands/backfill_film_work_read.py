@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from movies.models import Filmwork
+from movies.read_model import purge_orphans, refresh_film_works
+
+
+class Command(BaseCommand):
+    help = 'Полностью перестраивает витрину content.film_work_read'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = Filmwork.objects.order_by('id').values_list('id', flat=True)
+        total, last_id = 0, None
+        while True:
+            batch = ids.filter(id__gt=last_id) if last_id else ids
+            batch = list(batch[:batch_size])
+            if not batch:
+                break
+            total += refresh_film_works(batch)
+            last_id = batch[-1]
+            self.stdout.write(f'{total} film works projected')
+
+        purged = purge_orphans()
+        self.stdout.write(self.style.SUCCESS(
+            f'Backfill done: {total} rows, {purged} orphans removed'))
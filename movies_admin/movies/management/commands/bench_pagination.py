@@ -0,0 +1,53 @@
+import json
+from time import perf_counter
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+
+from movies.api.v1.views import MoviesListApi
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает стоимость первой и N-й страницы '
+            'для выдачи по номеру страницы и по курсору')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=20)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        self.factory = RequestFactory()
+        self.view = MoviesListApi.as_view()
+        self.repeat = options['repeat']
+        last_page = options['pages']
+
+        for page in (1, last_page):
+            elapsed, queries, _ = self.measure({'page': page})
+            self.report('page', page, elapsed, queries)
+
+        cursor = ''
+        for page in range(1, last_page + 1):
+            elapsed, queries, body = self.measure({'cursor': cursor})
+            if page in (1, last_page):
+                self.report('cursor', page, elapsed, queries)
+            if (cursor := body['next']) is None:
+                break
+
+    def measure(self, params):
+        timings = []
+        for _ in range(self.repeat):
+            with CaptureQueriesContext(connection) as ctx:
+                started = perf_counter()
+                response = self.view(
+                    self.factory.get('/api/v1/movies/', params))
+                timings.append(perf_counter() - started)
+        return (min(timings), len(ctx.captured_queries),
+                json.loads(response.content))
+
+    def report(self, mode, page, elapsed, queries):
+        self.stdout.write(
+            f'{mode:>6} page {page:>5}: {elapsed * 1000:8.2f} ms, '
+            f'{queries} queries'
+        )
@@ -0,0 +1,39 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from movies.read_model import (changed_film_work_ids, purge_orphans,
+                               read_model_watermark, refresh_film_works)
+
+
+class Command(BaseCommand):
+    help = ('Обновляет в витрине content.film_work_read только фильмы, '
+            'изменившиеся с последней отметки updated_at')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--full', action='store_true',
+                            help='перестроить всю витрину: так уходят '
+                                 'связи, удалённые в обход сигналов')
+
+    def handle(self, *args, **options):
+        if options['full']:
+            call_command('backfill_film_work_read',
+                         batch_size=options['batch_size'],
+                         stdout=self.stdout)
+            return
+
+        watermark = read_model_watermark()
+        if watermark is None:
+            raise CommandError('The read model is empty, '
+                               'run backfill_film_work_read first')
+
+        batch_size = options['batch_size']
+        ids = list(changed_film_work_ids(watermark))
+        total = 0
+        for start in range(0, len(ids), batch_size):
+            total += refresh_film_works(ids[start:start + batch_size])
+
+        purged = purge_orphans()
+        self.stdout.write(self.style.SUCCESS(
+            f'Refreshed {total} rows since {watermark}, '
+            f'{purged} orphans removed'))
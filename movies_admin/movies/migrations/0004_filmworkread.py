@@ -0,0 +1,33 @@
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0003_alter_genre_description'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FilmworkRead',
+            fields=[
+                ('id', models.UUIDField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.TextField(blank=True, verbose_name='title')),
+                ('description', models.TextField(blank=True, null=True, verbose_name='Description')),
+                ('creation_date', models.DateField(null=True, verbose_name='Premiere Date')),
+                ('rating', models.FloatField(blank=True, null=True, verbose_name='Rating')),
+                ('type', models.TextField(verbose_name='Type')),
+                ('actors', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), default=list, size=None)),
+                ('directors', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), default=list, size=None)),
+                ('writers', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(), default=list, size=None)),
+                ('genres', django.contrib.postgres.fields.ArrayField(base_field=models.TextField(null=True), default=list, size=None)),
+                ('source_updated_at', models.DateTimeField(db_index=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Movie read model',
+                'verbose_name_plural': 'Movie read model',
+                'db_table': 'content"."film_work_read',
+            },
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.2.5 on 2026-10-18 05:02
+
+from django.db import migrations
+
+CONTENT_TABLES = (
+    'film_work', 'person', 'genre', 'person_film_work', 'genre_film_work',
+)
+
+# Уведомление на команду, а не на строку: массовая загрузка даёт одно
+# уведомление на 100 id, а не по одному на каждую строку. Полезная
+# нагрузка: "<таблица>:<id>,<id>,...", для связей — id фильмов.
+NOTIFY_FUNCTION = """
+CREATE OR REPLACE FUNCTION content.notify_content_change() RETURNS trigger AS $$
+DECLARE
+    target text := TG_TABLE_NAME;
+    id_column text := 'id';
+    ids_sql text;
+    payload text;
+BEGIN
+    IF TG_TABLE_NAME IN ('person_film_work', 'genre_film_work') THEN
+        target := 'film_work';
+        id_column := 'film_work_id';
+    END IF;
+    IF TG_OP = 'INSERT' THEN
+        ids_sql := format('SELECT DISTINCT %1$I FROM new_rows', id_column);
+    ELSIF TG_OP = 'DELETE' THEN
+        ids_sql := format('SELECT DISTINCT %1$I FROM old_rows', id_column);
+    ELSE
+        ids_sql := format('SELECT %1$I FROM new_rows '
+                          'UNION SELECT %1$I FROM old_rows', id_column);
+    END IF;
+    FOR payload IN EXECUTE format(
+        'SELECT string_agg(id::text, '','') FROM ('
+        '    SELECT id, (row_number() OVER (ORDER BY id) - 1) / %s AS chunk'
+        '    FROM (%s) AS changed (id)'
+        ') AS numbered GROUP BY chunk', 100, ids_sql)
+    LOOP
+        PERFORM pg_notify('content_changes', target || ':' || payload);
+    END LOOP;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+"""
+
+# Триггер с переходными таблицами может ловить только одно событие.
+CREATE_TRIGGERS = """
+CREATE TRIGGER {table}_notify_insert
+AFTER INSERT ON content.{table}
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION content.notify_content_change();
+CREATE TRIGGER {table}_notify_update
+AFTER UPDATE ON content.{table}
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION content.notify_content_change();
+CREATE TRIGGER {table}_notify_delete
+AFTER DELETE ON content.{table}
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION content.notify_content_change();
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER IF EXISTS {table}_notify_insert ON content.{table};
+DROP TRIGGER IF EXISTS {table}_notify_update ON content.{table};
+DROP TRIGGER IF EXISTS {table}_notify_delete ON content.{table};
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_updated_at_id_indexes'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql=NOTIFY_FUNCTION,
+            reverse_sql='DROP FUNCTION IF EXISTS '
+                        'content.notify_content_change();',
+        ),
+        migrations.RunSQL(
+            sql=[CREATE_TRIGGERS.format(table=table)
+                 for table in CONTENT_TABLES],
+            reverse_sql=[DROP_TRIGGERS.format(table=table)
+                         for table in CONTENT_TABLES],
+        ),
+    ]
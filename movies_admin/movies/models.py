@@ -1,4 +1,5 @@
 import uuid
+from django.contrib.postgres.fields import ArrayField
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils.translation import gettext_lazy as _
@@ -32,6 +33,10 @@ class Genre(UUIDMixin, TimeStampedMixin):
         db_table = "content\".\"genre"
         verbose_name = _('Genre')
         verbose_name_plural = _('Genres')
+        indexes = [
+            models.Index(fields=['updated_at', 'id'],
+                         name='genre_updated_at_id_idx'),
+        ]
 
 
 class Person(UUIDMixin, TimeStampedMixin):
@@ -44,6 +49,10 @@ class Person(UUIDMixin, TimeStampedMixin):
         db_table = "content\".\"person"
         verbose_name = _('Person')
         verbose_name_plural = _('Persons')
+        indexes = [
+            models.Index(fields=['updated_at', 'id'],
+                         name='person_updated_at_id_idx'),
+        ]
 
 
 class Filmwork(UUIDMixin, TimeStampedMixin):
@@ -77,6 +86,10 @@ class Filmwork(UUIDMixin, TimeStampedMixin):
         db_table = "content\".\"film_work"
         verbose_name = _('Movies/TV Shows')
         verbose_name_plural = _('Movies and TV Shows')
+        indexes = [
+            models.Index(fields=['updated_at', 'id'],
+                         name='film_work_updated_at_id_idx'),
+        ]
 
 
 class FilmRole(models.TextChoices):
@@ -112,3 +125,25 @@ class GenreFilmwork(UUIDMixin):
         verbose_name = _('Movie Genre')
         verbose_name_plural = _('Movie Genres')
         unique_together = ('film_work', 'genre')
+
+
+class FilmworkRead(models.Model):
+    id = models.UUIDField(_('ID'), primary_key=True)
+    title = models.TextField(_('title'), blank=True)
+    description = models.TextField(_('Description'), blank=True, null=True)
+    creation_date = models.DateField(_('Premiere Date'), null=True)
+    rating = models.FloatField(_('Rating'), null=True, blank=True)
+    type = models.TextField(_('Type'))
+    actors = ArrayField(models.TextField(), default=list)
+    directors = ArrayField(models.TextField(), default=list)
+    writers = ArrayField(models.TextField(), default=list)
+    genres = ArrayField(models.TextField(null=True), default=list)
+    source_updated_at = models.DateTimeField(null=True, db_index=True)
+
+    def __str__(self):
+        return self.title
+
+    class Meta:
+        db_table = "content\".\"film_work_read"
+        verbose_name = _('Movie read model')
+        verbose_name_plural = _('Movie read model')
@@ -0,0 +1,90 @@
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Max, Q
+from django.db.models.functions import Greatest
+
+from movies.models import (Filmwork, FilmRole, FilmworkRead, GenreFilmwork,
+                           PersonFilmwork)
+
+API_FIELDS = (
+    'id', 'title', 'description', 'creation_date', 'rating', 'type',
+    'actors', 'writers', 'directors', 'genres'
+)
+
+
+def aggregated_filmworks():
+    return Filmwork.objects.annotate(
+        actors=ArrayAgg('persons__full_name',
+                        distinct=True, filter=Q(
+                            personfilmwork__role=FilmRole.ACTOR)),
+        directors=ArrayAgg('persons__full_name',
+                           distinct=True, filter=Q(
+                               personfilmwork__role=FilmRole.DIRECTOR)),
+        writers=ArrayAgg('persons__full_name',
+                         distinct=True, filter=Q(
+                             personfilmwork__role=FilmRole.WRITER)),
+    ).values(
+        'id', 'title', 'description', 'creation_date',
+        'rating', 'type', 'actors', 'writers', 'directors'
+    ).annotate(
+        genres=ArrayAgg('genres__name', distinct=True),
+    )
+
+
+def read_filmworks():
+    return FilmworkRead.objects.values(*API_FIELDS)
+
+
+def source_updated_at(ids):
+    """Свежесть источников фильма: сам фильм, его персоны, жанры
+    и связи. Отдельный запрос: в aggregated_filmworks имя genres уже
+    занято массивом названий."""
+    return dict(Filmwork.objects.filter(id__in=ids).annotate(
+        source_updated_at=Greatest('updated_at',
+                                   Max('persons__updated_at'),
+                                   Max('genres__updated_at'),
+                                   Max('personfilmwork__created_at'),
+                                   Max('genrefilmwork__created_at')),
+    ).values_list('id', 'source_updated_at'))
+
+
+def refresh_film_works(ids):
+    ids = list(ids)
+    updated_at = source_updated_at(ids)
+    objs = [FilmworkRead(**row, source_updated_at=updated_at[row['id']])
+            for row in aggregated_filmworks().filter(id__in=ids)]
+    FilmworkRead.objects.bulk_create(
+        objs,
+        update_conflicts=True,
+        unique_fields=['id'],
+        update_fields=[*API_FIELDS[1:], 'source_updated_at'],
+    )
+    FilmworkRead.objects.filter(id__in=ids).exclude(
+        id__in=[obj.id for obj in objs]).delete()
+    return len(objs)
+
+
+def read_model_watermark():
+    return FilmworkRead.objects.aggregate(
+        watermark=Max('source_updated_at'))['watermark']
+
+
+def changed_film_work_ids(since):
+    """Фильмы, изменившиеся с отметки since: сам фильм, его персоны,
+    жанры или новые связи. Удалённую связь не видно ни по одной дате:
+    удаления через ORM обновляют витрину сигналом, а после удалений
+    в обход него нужен refresh_film_work_read --full."""
+    return Filmwork.objects.filter(
+        updated_at__gte=since
+    ).values_list('id', flat=True).union(
+        PersonFilmwork.objects.filter(
+            Q(person__updated_at__gte=since) | Q(created_at__gte=since)
+        ).values_list('film_work_id', flat=True),
+        GenreFilmwork.objects.filter(
+            Q(genre__updated_at__gte=since) | Q(created_at__gte=since)
+        ).values_list('film_work_id', flat=True),
+    )
+
+
+def purge_orphans():
+    return FilmworkRead.objects.exclude(
+        id__in=Filmwork.objects.values('id')).delete()[0]
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from movies.models import (Filmwork, Genre, GenreFilmwork, Person,
+                           PersonFilmwork)
+from movies.read_model import refresh_film_works
+
+
+def refresh_read_model(film_work_ids):
+    if settings.MOVIES_API_READ_MODEL:
+        ids = list(film_work_ids)
+        transaction.on_commit(lambda: refresh_film_works(ids))
+
+
+@receiver(m2m_changed, sender=Filmwork.genres.through)
+@receiver(m2m_changed, sender=Filmwork.persons.through)
+def refresh_filmwork_m2m(sender, instance, action, reverse,
+                         pk_set, **kwargs):
+    if action.startswith('post_'):
+        refresh_read_model((pk_set or ()) if reverse else [instance.pk])
+
+
+@receiver(post_save, sender=Filmwork)
+@receiver(post_delete, sender=Filmwork)
+def refresh_filmwork(sender, instance, **kwargs):
+    refresh_read_model([instance.pk])
+
+
+@receiver(post_save, sender=PersonFilmwork)
+@receiver(post_delete, sender=PersonFilmwork)
+@receiver(post_save, sender=GenreFilmwork)
+@receiver(post_delete, sender=GenreFilmwork)
+def refresh_filmwork_link(sender, instance, **kwargs):
+    refresh_read_model([instance.film_work_id])
+
+
+@receiver(post_save, sender=Person)
+def refresh_person_filmworks(sender, instance, **kwargs):
+    refresh_read_model(PersonFilmwork.objects.filter(
+        person=instance).values_list('film_work_id', flat=True))
+
+
+@receiver(post_save, sender=Genre)
+def refresh_genre_filmworks(sender, instance, **kwargs):
+    refresh_read_model(GenreFilmwork.objects.filter(
+        genre=instance).values_list('film_work_id', flat=True))
@@ -0,0 +1,135 @@
+import json
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from movies.api.v1.cache import get_response_cache
+from movies.models import (Filmwork, FilmRole, FilmworkRead, Genre,
+                           GenreFilmwork, Person, PersonFilmwork)
+
+MOVIES_URL = '/api/v1/movies/'
+
+
+@override_settings(MOVIES_API_READ_MODEL=False)
+class MoviesApiTestCase(TestCase):
+    films_count = 120
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.films = Filmwork.objects.bulk_create(
+            Filmwork(title=f'Film {number}')
+            for number in range(cls.films_count))
+        cls.person = Person.objects.create(full_name='Actor')
+        PersonFilmwork.objects.bulk_create(
+            PersonFilmwork(film_work=film, person=cls.person,
+                           role=FilmRole.ACTOR)
+            for film in cls.films)
+        cls.genre = Genre.objects.create(name='Drama')
+        GenreFilmwork.objects.bulk_create(
+            GenreFilmwork(film_work=film, genre=cls.genre)
+            for film in cls.films)
+
+    def setUp(self):
+        get_response_cache().clear()
+
+
+class NumberedPageTest(MoviesApiTestCase):
+
+    def test_query_count_does_not_grow_with_page(self):
+        """count, страница id, валидаторы, версия кэша и агрегация
+        только по id страницы — на первой и на последней странице."""
+        for page in (1, 3):
+            with self.assertNumQueries(5):
+                response = self.client.get(MOVIES_URL, {'page': page})
+            self.assertEqual(response.status_code, 200)
+
+    def test_aggregates_only_page_ids(self):
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(MOVIES_URL, {'page': 2})
+        aggregates = [query['sql'] for query in ctx.captured_queries
+                      if 'ARRAY_AGG' in query['sql']]
+        self.assertEqual(len(aggregates), 1)
+        self.assertIn(' IN (', aggregates[0])
+
+    def test_page_is_the_same_with_and_without_streaming(self):
+        plain = self.client.get(MOVIES_URL, {'page': 2}).json()
+        streamed = json.loads(b''.join(self.client.get(
+            MOVIES_URL, {'page': 2, 'stream': ''}).streaming_content))
+        expected = sorted(str(film.id) for film in self.films)[50:100]
+        self.assertEqual([row['id'] for row in plain['results']], expected)
+        self.assertEqual([row['id'] for row in streamed['results']],
+                         expected)
+
+
+class ConditionalGetTest(MoviesApiTestCase):
+
+    def assert_not_modified(self, url, params, queries):
+        """Повторный запрос с ETag отвечает 304 без агрегации:
+        только запросы id страницы и валидаторов."""
+        etag = self.client.get(url, params)['ETag']
+        with CaptureQueriesContext(connection) as ctx, \
+                self.assertNumQueries(queries):
+            response = self.client.get(url, params,
+                                       HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([query for query in ctx.captured_queries
+                          if 'ARRAY_AGG' in query['sql']])
+
+    def test_list_page_not_modified(self):
+        self.assert_not_modified(MOVIES_URL, {'page': 2}, 3)
+
+    def test_detail_not_modified(self):
+        self.assert_not_modified(f'{MOVIES_URL}{self.films[0].id}/', {}, 1)
+
+    def test_role_change_changes_etag(self):
+        url = f'{MOVIES_URL}{self.films[0].id}/'
+        etag = self.client.get(url)['ETag']
+        PersonFilmwork.objects.filter(film_work=self.films[0]).update(
+            role=FilmRole.DIRECTOR)
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+    def test_swap_for_older_person_changes_etag(self):
+        url = f'{MOVIES_URL}{self.films[0].id}/'
+        older = Person.objects.create(full_name='Older')
+        Person.objects.filter(id=older.id).update(
+            updated_at=self.person.updated_at - timedelta(days=1))
+        etag = self.client.get(url)['ETag']
+        PersonFilmwork.objects.filter(film_work=self.films[0]).update(
+            person=older)
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+
+class ReadModelTest(MoviesApiTestCase):
+
+    def get_content(self, url, params, read_model):
+        get_response_cache().clear()
+        with self.settings(MOVIES_API_READ_MODEL=read_model):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.content
+
+    def test_backfill_matches_live_aggregation(self):
+        """После backfill витрина отдаёт те же байты, что и агрегация."""
+        call_command('backfill_film_work_read', stdout=StringIO())
+        self.assertEqual(FilmworkRead.objects.count(), self.films_count)
+        for url, params in ((MOVIES_URL, {'page': 2}),
+                            (f'{MOVIES_URL}{self.films[0].id}/', {})):
+            with self.subTest(url=url):
+                self.assertEqual(
+                    self.get_content(url, params, read_model=True),
+                    self.get_content(url, params, read_model=False))
+
+    def test_refresh_picks_up_new_links(self):
+        """Новая связь находится по created_at, даже без сигналов."""
+        call_command('backfill_film_work_read', stdout=StringIO())
+        comedy = Genre.objects.create(name='Comedy')
+        GenreFilmwork.objects.bulk_create(
+            [GenreFilmwork(film_work=self.films[0], genre=comedy)])
+        call_command('refresh_film_work_read', stdout=StringIO())
+        self.assertEqual(
+            FilmworkRead.objects.get(id=self.films[0].id).genres,
+            ['Comedy', 'Drama'])
@@ -0,0 +1,92 @@
+import logging
+from time import perf_counter, sleep
+
+from elasticsearch import Elasticsearch, helpers
+
+from config.metrics import BULK_DOCUMENTS, BULK_ERRORS, BULK_SECONDS
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {429}
+
+
+class BulkLoader:
+    """Загрузка документов в Elasticsearch пачками _bulk.
+
+    mode: bulk — один запрос за другим, streaming — то же потоково.
+    Размер запроса ограничен max_bytes. Документы, отклонённые
+    кластером (429, es_rejected_execution_exception), повторяются
+    с экспоненциальной задержкой.
+    """
+
+    def __init__(self, client: Elasticsearch, mode: str = 'bulk',
+                 max_bytes: int = 5 * 1024 * 1024, chunk_size: int = 1000,
+                 max_retries: int = 5, initial_backoff: float = 1.0,
+                 max_backoff: float = 60.0) -> None:
+        self.client = client
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.max_retries = max_retries
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+
+    def load(self, actions: list) -> tuple[list, list]:
+        """Загружает документы и возвращает ошибки:
+        (временные — стоит повторить позже, ошибки самих документов)."""
+        started = perf_counter()
+        BULK_DOCUMENTS.observe(len(actions))
+        pending = actions
+        transient, failed = [], []
+        for attempt in range(self.max_retries + 1):
+            by_id = {str(action['_id']): action for action in pending}
+            rejected = []
+            for ok, item in self.send(pending):
+                if ok:
+                    continue
+                info = next(iter(item.values()))
+                status = info.get('status')
+                if status in RETRY_STATUSES:
+                    # Если отклонён весь запрос, helpers копирует исходное
+                    # действие, и _id в нём может быть UUID, а не строкой.
+                    rejected.append(by_id[str(info.get('_id'))])
+                elif 'exception' in info:
+                    # Ошибка всего запроса (401, 403, 404, 413, 5xx),
+                    # а не документа: повтор позже может пройти.
+                    transient.append(info)
+                elif isinstance(status, int) and 400 <= status < 500:
+                    failed.append(info)
+                else:
+                    transient.append(info)
+            if not rejected:
+                break
+            if attempt == self.max_retries:
+                transient.extend({'_id': str(action['_id']), 'status': 429}
+                                 for action in rejected)
+                break
+            BULK_ERRORS.inc(len(rejected), kind='rejected')
+            delay = min(self.max_backoff,
+                        self.initial_backoff * 2 ** attempt)
+            logger.warning("Elasticsearch rejected %d documents, "
+                           "retrying in %.1fs", len(rejected), delay)
+            sleep(delay)
+            pending = rejected
+        BULK_SECONDS.observe(perf_counter() - started)
+        BULK_ERRORS.inc(len(transient), kind='transient')
+        BULK_ERRORS.inc(len(failed), kind='document')
+        for info in failed:
+            logger.error("Document %s was not indexed: %s",
+                         info.get('_id'), info.get('error'))
+        return transient, failed
+
+    def send(self, actions: list):
+        """Отправляет документы выбранным способом и отдаёт
+        результат по каждому документу."""
+        kwargs = {'chunk_size': self.chunk_size,
+                  'max_chunk_bytes': self.max_bytes,
+                  'raise_on_error': False,
+                  'raise_on_exception': False}
+        if self.mode == 'streaming':
+            return helpers.streaming_bulk(self.client, actions, **kwargs)
+        ok, errors = helpers.bulk(self.client, actions, **kwargs)
+        return [(False, error) for error in errors]
@@ -0,0 +1,96 @@
+from itertools import count
+from typing import Iterator
+
+from config.pg_connection_helpers import pg_cursor
+
+
+class FilmIdSet:
+    """id фильмов, изменившихся за цикл опроса, без повторов.
+
+    Пока id немного, они хранятся в памяти. Когда их становится больше
+    spill_threshold, множество переносится во временную таблицу
+    Postgres и дальше пополняется уже там. duplicates считает id,
+    которые пришли повторно и не будут заново объединяться и загружаться.
+
+    Временная таблица своя у каждого множества: в sharded.py на одном
+    соединении работают воркеры разных разделов. Запись в неё открывает
+    транзакцию, которая завершается в конце chunks() вместе с удалением
+    таблицы, чтобы сессия не висела в idle in transaction и не держала
+    vacuum. Раньше зафиксировать нельзя: id добавляются, пока открыт
+    именованный курсор обогащения.
+    """
+    _numbers = count()
+
+    def __init__(self, connection, spill_threshold: int) -> None:
+        self.connection = connection
+        self.spill_threshold = spill_threshold
+        self.table = f'etl_film_ids_{next(self._numbers)}'
+        self.ids = set()
+        self.spilled = False
+        self.duplicates = 0
+
+    def add(self, ids: list) -> None:
+        if self.spilled:
+            self._insert(ids)
+            return
+        before = len(self.ids)
+        self.ids.update(ids)
+        self.duplicates += len(ids) - (len(self.ids) - before)
+        if len(self.ids) > self.spill_threshold:
+            self._spill()
+
+    def _spill(self) -> None:
+        with pg_cursor(self.connection) as cursor:
+            cursor.execute(f'''
+            CREATE TEMP TABLE IF NOT EXISTS {self.table} (id uuid PRIMARY KEY)
+            ''')
+        self.spilled = True
+        self._insert(list(self.ids))
+        self.ids.clear()
+
+    def _insert(self, ids: list) -> None:
+        with pg_cursor(self.connection) as cursor:
+            cursor.execute(f'''
+            INSERT INTO {self.table}
+            SELECT unnest(%s::uuid[])
+            ON CONFLICT DO NOTHING
+            ''', (ids,))
+            self.duplicates += len(ids) - cursor.rowcount
+
+    def chunks(self, size: int) -> Iterator[list]:
+        """Отдаёт накопленные id пачками по size и очищает множество."""
+        if not self.spilled:
+            ids = sorted(self.ids)
+            self.ids.clear()
+            for start in range(0, len(ids), size):
+                yield ids[start:start + size]
+            return
+        try:
+            yield from self._spilled_chunks(size)
+        except BaseException:
+            # Транзакция могла прерваться: откатываем вместе с таблицей.
+            if not self.connection.closed:
+                self.connection.rollback()
+            raise
+        else:
+            with pg_cursor(self.connection) as cursor:
+                cursor.execute(f'DROP TABLE {self.table}')
+            self.connection.commit()
+        finally:
+            self.spilled = False
+
+    def _spilled_chunks(self, size: int) -> Iterator[list]:
+        last_id = None
+        while True:
+            with pg_cursor(self.connection) as cursor:
+                cursor.execute(f'''
+                SELECT id::text FROM {self.table}
+                WHERE %s::uuid IS NULL OR id > %s::uuid
+                ORDER BY id
+                LIMIT %s
+                ''', (last_id, last_id, size))
+                ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            yield ids
+            last_id = ids[-1]
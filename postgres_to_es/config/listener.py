@@ -0,0 +1,74 @@
+import logging
+import select
+from collections import defaultdict
+from time import monotonic
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeListener:
+    """Слушает NOTIFY от триггеров на таблицах content.
+
+    Уведомления приходят только вне транзакции, поэтому используется
+    отдельное соединение в режиме autocommit, а не соединение воркера.
+    Триггеры шлют одно уведомление на команду SQL и до 100 id в нём:
+    "<таблица>:<id>,<id>,...".
+    """
+
+    def __init__(self, pg_conf: dict, channel: str, debounce: float,
+                 max_batch: int) -> None:
+        self.pg_conf = pg_conf
+        self.channel = channel
+        self.debounce = debounce
+        self.max_batch = max_batch
+        self.connection = None
+
+    def connect(self) -> None:
+        self.connection = psycopg2.connect(**self.pg_conf)
+        self.connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'LISTEN {self.channel};')
+        logger.info("Listening for notifications on %s", self.channel)
+
+    def close(self) -> None:
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def _poll(self, timeout: float) -> list:
+        if select.select([self.connection], [], [], timeout) == ([], [], []):
+            return []
+        self.connection.poll()
+        notifies = self.connection.notifies[:]
+        self.connection.notifies.clear()
+        return notifies
+
+    def wait(self, timeout: float) -> dict:
+        """Ждёт изменений не дольше timeout секунд.
+
+        После первого уведомления ещё debounce секунд собирает остальные
+        и возвращает их сгруппированными по таблицам без повторов.
+        """
+        if self.connection is None or self.connection.closed:
+            self.connect()
+
+        changes = defaultdict(set)
+        received = 0
+        deadline = monotonic() + max(timeout, 0)
+        while (left := deadline - monotonic()) > 0:
+            for notify in self._poll(left):
+                table, _, row_ids = notify.payload.partition(':')
+                row_ids = row_ids.split(',')
+                changes[table].update(row_ids)
+                received += len(row_ids)
+            if changes:
+                deadline = min(deadline, monotonic() + self.debounce)
+            if received >= self.max_batch:
+                break
+        if received:
+            logger.debug("Coalesced %d notifications into %d ids", received,
+                         sum(map(len, changes.values())))
+        return changes
@@ -0,0 +1,39 @@
+import json
+import logging
+
+from settings import LOG_FORMAT, LOG_LEVEL
+
+TEXT_FORMAT = ('%(asctime)s - %(processName)s - %(threadName)s - '
+               '%(levelname)s: %(message)s')
+# Атрибуты LogRecord, которые не считаются полями из extra.
+RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись лога одной строкой JSON. Поля из extra попадают
+    в неё как есть, например снимок метрик."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'process': record.processName,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        entry.update({key: value for key, value in vars(record).items()
+                      if key not in RECORD_ATTRS})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(level: str = LOG_LEVEL, fmt: str = LOG_FORMAT) -> None:
+    """Настраивает корневой логгер: text или json."""
+    handler = logging.StreamHandler()
+    if fmt == 'json':
+        handler.setFormatter(JsonFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(TEXT_FORMAT))
+    logging.basicConfig(level=level, handlers=[handler], force=True)
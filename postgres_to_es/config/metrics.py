@@ -0,0 +1,192 @@
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+
+logger = logging.getLogger(__name__)
+
+# Границы гистограмм по умолчанию: секунды, от миллисекунды до минуты.
+TIME_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Для размеров: строки, документы, id.
+SIZE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Metric:
+    """Метрика с метками. Значения хранятся по кортежу значений меток
+    и меняются под блокировкой: в них пишут потоки ступеней."""
+    kind = ''
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: tuple = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} {self.kind}']
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.extend(self.samples(key, value))
+        return lines
+
+    def samples(self, key: tuple, value) -> list[str]:
+        return [f'{self.name}{_labels(self.labelnames, key)} {value}']
+
+    def snapshot(self) -> dict:
+        """Значения для структурного лога: {'метки': значение}."""
+        with self.lock:
+            return {','.join(key): self.value(value)
+                    for key, value in self.values.items()}
+
+    def value(self, value):
+        return value
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = value
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str,
+                 labelnames: tuple = (), buckets: tuple = TIME_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, amount: float, **labels) -> None:
+        key = self.key(labels)
+        with self.lock:
+            counts, total = self.values.get(
+                key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect_left(self.buckets, amount)] += 1
+            self.values[key] = (counts, total + amount)
+
+    @contextmanager
+    def time(self, **labels):
+        """Замеряет время блока with."""
+        started = perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(perf_counter() - started, **labels)
+
+    def samples(self, key: tuple, value) -> list[str]:
+        counts, total = value
+        lines, cumulative = [], 0
+        for bound, count in zip((*self.buckets, '+Inf'), counts):
+            cumulative += count
+            labels = _labels(self.labelnames, key, f'le="{bound}"')
+            lines.append(f'{self.name}_bucket{labels} {cumulative}')
+        labels = _labels(self.labelnames, key)
+        lines.append(f'{self.name}_sum{labels} {total}')
+        lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+    def value(self, value) -> dict:
+        counts, total = value
+        return {'count': sum(counts), 'sum': round(total, 6)}
+
+
+class Registry:
+    """Набор метрик процесса в текстовом формате Prometheus."""
+
+    def __init__(self) -> None:
+        self.metrics = []
+
+    def register(self, metric: Metric) -> Metric:
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        return '\n'.join(line for metric in self.metrics
+                         for line in metric.render()) + '\n'
+
+    def snapshot(self) -> dict:
+        return {metric.name: snapshot for metric in self.metrics
+                if (snapshot := metric.snapshot())}
+
+
+REGISTRY = Registry()
+
+ROWS_EXTRACTED = REGISTRY.register(Counter(
+    'etl_rows_extracted_total', 'Changed rows read from Postgres.',
+    ('table',)))
+ENRICH_FILMS = REGISTRY.register(Histogram(
+    'etl_enrich_film_ids', 'Films found per page of changed rows.',
+    ('table',), SIZE_BUCKETS))
+ENRICH_SECONDS = REGISTRY.register(Histogram(
+    'etl_enrich_seconds', 'Time to find films of changed rows.',
+    ('table',)))
+MERGE_SECONDS = REGISTRY.register(Histogram(
+    'etl_merge_seconds', 'Time of the merge query per batch.'))
+TRANSFORM_SECONDS = REGISTRY.register(Histogram(
+    'etl_transform_seconds', 'Time to build ES documents per batch.'))
+BULK_DOCUMENTS = REGISTRY.register(Histogram(
+    'etl_bulk_documents', 'Documents sent per bulk load.',
+    buckets=SIZE_BUCKETS))
+BULK_SECONDS = REGISTRY.register(Histogram(
+    'etl_bulk_seconds', 'Time of a bulk load including retries.'))
+BULK_ERRORS = REGISTRY.register(Counter(
+    'etl_bulk_errors_total', 'Documents not indexed by Elasticsearch.',
+    ('kind',)))
+DOCUMENTS = REGISTRY.register(Counter(
+    'etl_documents_total', 'Documents by result: written or skipped.',
+    ('result',)))
+STATE_LAG = REGISTRY.register(Gauge(
+    'etl_state_lag_seconds', 'Now minus the saved watermark of a table.',
+    ('table',)))
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self) -> None:
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type',
+                         'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        """Запросы сборщика не пишутся в лог."""
+
+
+def start_http_server(port: int, host: str = '0.0.0.0') -> ThreadingHTTPServer:
+    """Отдаёт метрики по HTTP из фонового потока."""
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics',
+                     daemon=True).start()
+    logger.info("Serving metrics on %s:%d", host, server.server_port)
+    return server
@@ -0,0 +1,88 @@
+import hashlib
+import logging
+from math import ceil
+from typing import NamedTuple
+
+import psycopg2
+from psycopg2.extensions import ISOLATION_LEVEL_AUTOCOMMIT
+
+logger = logging.getLogger(__name__)
+
+# Первые ключи рекомендательных блокировок: участник и раздел.
+MEMBER_LOCK = 5301
+PARTITION_LOCK = 5302
+
+
+class Partition(NamedTuple):
+    """Раздел фильмов: index из count по хешу film_work.id."""
+    index: int
+    count: int
+
+    def sql(self, column: str) -> str:
+        """Условие принадлежности строки разделу для WHERE."""
+        return (f"('x' || substr(md5({column}::text), 1, 8))::bit(32)"
+                f"::bigint % {self.count} = {self.index}")
+
+    def contains(self, film_id) -> bool:
+        """То же условие в Python, например для id из NOTIFY."""
+        digest = hashlib.md5(str(film_id).encode()).hexdigest()
+        return int(digest[:8], 16) % self.count == self.index
+
+
+class PartitionClaims:
+    """Захват разделов рекомендательными блокировками Postgres.
+
+    Каждый процесс держит отдельное соединение в режиме autocommit
+    с блокировкой участника и блокировками своих разделов. Если процесс
+    или контейнер падает, соединение закрывается и его разделы
+    освобождаются. rebalance() держит у процесса справедливую долю:
+    число разделов, делённое на число живых участников.
+    """
+
+    def __init__(self, pg_conf: dict, count: int) -> None:
+        self.count = count
+        self.connection = psycopg2.connect(**pg_conf)
+        self.connection.set_isolation_level(ISOLATION_LEVEL_AUTOCOMMIT)
+        self.held = set()
+        with self.connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_lock(%s, pg_backend_pid())',
+                           (MEMBER_LOCK,))
+
+    def members(self) -> int:
+        with self.connection.cursor() as cursor:
+            cursor.execute('''
+            SELECT count(*) FROM pg_locks
+            WHERE locktype = 'advisory' AND classid = %s
+              AND objsubid = 2 AND granted
+            ''', (MEMBER_LOCK,))
+            return cursor.fetchone()[0]
+
+    def rebalance(self) -> tuple[set, set]:
+        """Захватывает свободные разделы до своей доли и отпускает
+        лишние. Возвращает (захваченные, отпущенные)."""
+        share = ceil(self.count / max(self.members(), 1))
+        claimed, released = set(), set()
+        with self.connection.cursor() as cursor:
+            while len(self.held) > share:
+                index = max(self.held)
+                cursor.execute('SELECT pg_advisory_unlock(%s, %s)',
+                               (PARTITION_LOCK, index))
+                self.held.discard(index)
+                released.add(index)
+            for index in range(self.count):
+                if len(self.held) >= share:
+                    break
+                if index in self.held:
+                    continue
+                cursor.execute('SELECT pg_try_advisory_lock(%s, %s)',
+                               (PARTITION_LOCK, index))
+                if cursor.fetchone()[0]:
+                    self.held.add(index)
+                    claimed.add(index)
+        if claimed or released:
+            logger.info("Partitions claimed: %s, released: %s, held: %s",
+                        sorted(claimed), sorted(released), sorted(self.held))
+        return claimed, released
+
+    def close(self) -> None:
+        self.connection.close()
@@ -16,3 +16,13 @@ def pg_cursor(conn: psycopg2.connect):
     cursor = conn.cursor()
     yield cursor
     cursor.close()
+
+
+@contextmanager
+def pg_server_cursor(conn: psycopg2.connect, name: str, itersize: int):
+    """Именованный курсор: строки остаются на сервере и читаются
+    пачками по itersize, а не загружаются все сразу."""
+    cursor = conn.cursor(name=name)
+    cursor.itersize = itersize
+    yield cursor
+    cursor.close()
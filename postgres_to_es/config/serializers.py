@@ -0,0 +1,51 @@
+import json
+
+from elastic_transport import JsonSerializer, NdjsonSerializer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def dumps(serializer: JsonSerializer, data) -> bytes:
+    """Кодирует данные в JSON: orjson, если он установлен, иначе json.
+    Уже закодированные строки и байты передаются как есть."""
+    if isinstance(data, str):
+        return data.encode('utf-8', 'surrogatepass')
+    if isinstance(data, bytes):
+        return data
+    if orjson is not None:
+        return orjson.dumps(data, default=serializer.default)
+    return json.dumps(data, default=serializer.default, ensure_ascii=False,
+                      separators=(',', ':')).encode('utf-8', 'surrogatepass')
+
+
+class FastJsonSerializer(JsonSerializer):
+    """Сериализатор тел запросов и строк действий _bulk."""
+
+    def dumps(self, data) -> bytes:
+        return dumps(self, data)
+
+    def loads(self, data: bytes):
+        if orjson is None or not data:
+            return super().loads(data)
+        return orjson.loads(data)
+
+
+class FastNdjsonSerializer(NdjsonSerializer):
+    """Сериализатор тела _bulk: строки, уже закодированные
+    в JSON, склеиваются без повторного кодирования."""
+
+    def dumps(self, data) -> bytes:
+        if isinstance(data, (str, bytes)):
+            return dumps(self, data)
+        return b''.join(dumps(self, line) + b'\n' for line in data)
+
+
+def es_serializers() -> dict:
+    """Сериализаторы для Elasticsearch(..., serializers=...)."""
+    return {
+        FastJsonSerializer.mimetype: FastJsonSerializer(),
+        FastNdjsonSerializer.mimetype: FastNdjsonSerializer(),
+    }
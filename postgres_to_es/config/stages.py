@@ -0,0 +1,59 @@
+import logging
+import queue
+import threading
+from typing import Generator
+
+from config.utils import coroutine
+
+logger = logging.getLogger(__name__)
+
+
+class ThreadedStage:
+    """Ступень конвейера в отдельном потоке с ограниченной очередью.
+
+    Всё, что отправлено в обёрнутые узлы, попадает в одну очередь FIFO
+    и передаётся дальше одним потоком строго в порядке отправки. Поэтому
+    отметка, отправленная после пачек, доходит до сохранения только
+    после их загрузки. Заполненная очередь блокирует отправителя.
+    Первая ошибка запоминается, остаток очереди отбрасывается, а ошибка
+    поднимается у отправителя при следующей отправке или в join().
+    """
+
+    def __init__(self, name: str, maxsize: int) -> None:
+        self.name = name
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.error = None
+        self.thread = threading.Thread(target=self._run, name=name,
+                                       daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        while True:
+            node, item = self.queue.get()
+            try:
+                if self.error is None:
+                    node.send(item)
+            except Exception as error:
+                logger.exception("Stage %s failed", self.name)
+                self.error = error
+            finally:
+                self.queue.task_done()
+
+    def _raise_error(self) -> None:
+        if self.error is None:
+            return
+        self.queue.join()
+        error, self.error = self.error, None
+        raise error
+
+    @coroutine
+    def wrap(self, next_node: Generator):
+        """Передаёт отправленное в next_node через поток ступени."""
+        while item := (yield):
+            self._raise_error()
+            self.queue.put((next_node, item))
+
+    def join(self) -> None:
+        """Дожидается обработки всего отправленного в ступень."""
+        self.queue.join()
+        self._raise_error()
@@ -15,14 +15,34 @@ def coroutine(func):
 
 
 def preprocess_rows(rows):
-    return tuple([row['id'] for row in rows], )
+    """Список id для параметра = ANY(%s::uuid[])."""
+    return [row['id'] for row in rows]
+
+
+def load_index_body(index_path: str) -> dict:
+    with open(index_path, "r") as fp:
+        return json.load(fp)
 
 
 def create_index_if_not_exists(client: Elasticsearch,
-                               index_path: str, index_name: str):
-    if not client.indices.exists(index="movies"):
-        with open(index_path, "r") as fp:
-            client.indices.create(
-                index=index_name,
-                body=json.load(fp)
-            ) 
+                               index_path: str, index_name: str) -> bool:
+    """Создаёт первую версию индекса <index_name>_v1 и псевдоним
+    index_name на неё, чтобы переиндексация могла подменить индекс.
+    Возвращает True, если индекс пришлось создать."""
+    if client.indices.exists(index=index_name):
+        return False
+    body = load_index_body(index_path)
+    client.indices.create(
+        index=f'{index_name}_v1',
+        body={**body, 'aliases': {index_name: {}}}
+    )
+    return True
+
+
+def index_uuid(client: Elasticsearch, index_name: str) -> str:
+    """uuid индекса за псевдонимом index_name. Меняется, когда индекс
+    пересоздают или переиндексация подменяет псевдоним."""
+    settings = client.indices.get_settings(index=index_name,
+                                           name='index.uuid')
+    return ','.join(sorted(value['settings']['index']['uuid']
+                           for value in settings.values()))
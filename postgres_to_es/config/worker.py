@@ -1,218 +1,428 @@
+import json
+from collections import Counter
+from random import random
 from typing import Generator
 
-from elasticsearch import Elasticsearch, helpers
+from pydantic import ValidationError
 
+from config.bulk import BulkLoader
 from config.choices import Tables
+from config.film_ids import FilmIdSet
+from config.metrics import (DOCUMENTS, ENRICH_FILMS, ENRICH_SECONDS,
+                            MERGE_SECONDS, ROWS_EXTRACTED, TRANSFORM_SECONDS)
+from config.partitions import Partition
 import logging
-from config.pg_connection_helpers import pg_cursor
+from config.pg_connection_helpers import pg_cursor, pg_server_cursor
 from config.utils import coroutine, preprocess_rows
-from settings import NUMBER_OF_FETCHED, STATE_KEY
-from state.models import MovieRow, State
-
-logging.basicConfig(level=logging.DEBUG,
-                    format='%(asctime)s - %(levelname)s: %(message)s')
+from settings import (ETL_RAW_JSON, ETL_TRANSFORM, ETL_VALIDATE_SAMPLE,
+                      FILM_IDS_SPILL_THRESHOLD, INDEX_NAME, ITERSIZE,
+                      NUMBER_OF_FETCHED)
+from state.dead_letters import DeadLetterQueue
+from state.hash_index import DocumentHashIndex, document_hash
+from state.models import (Checkpoint, MovieDocument, MovieRow, RawDocument,
+                          State, Watermark)
 
 logger = logging.getLogger(__name__)
 
+MERGE_SQL = '''
+SELECT
+    fw.id,
+    fw.rating as imdb_rating,
+    fw.title,
+    fw.description,
+    fw.type,
+    COALESCE (
+       json_agg(
+           DISTINCT jsonb_build_object(
+               'id', g.id,
+               'name', g.name
+           )
+       ) FILTER (WHERE g.id is not null),
+       '[]'
+    ) as genres,
+    COALESCE (
+       json_agg(
+           DISTINCT jsonb_build_object(
+               'id', p.id,
+               'name', p.full_name
+           )
+       ) FILTER (WHERE p.id is not null AND pfw.role = 'director'),
+       '[]'
+    ) as directors,
+    COALESCE (
+       json_agg(
+           DISTINCT jsonb_build_object(
+               'id', p.id,
+               'name', p.full_name
+           )
+       ) FILTER (WHERE p.id is not null AND pfw.role = 'actor'),
+       '[]'
+    ) as actors,
+    COALESCE (
+       json_agg(
+           DISTINCT jsonb_build_object(
+               'id', p.id,
+               'name', p.full_name
+           )
+       ) FILTER (WHERE p.id is not null AND pfw.role = 'writer'),
+       '[]'
+    ) as writers
+FROM
+    content.film_work fw
+LEFT JOIN
+    content.person_film_work pfw ON pfw.film_work_id = fw.id
+LEFT JOIN
+    content.person p ON p.id = pfw.person_id
+LEFT JOIN
+    content.genre_film_work gfw ON gfw.film_work_id = fw.id
+LEFT JOIN
+    content.genre g ON g.id = gfw.genre_id
+WHERE
+   fw.id = ANY(%s::uuid[])
+GROUP BY
+    fw.id
+'''
+
+# Тот же запрос, но документ для ES собирается прямо в Postgres.
+MERGE_SOURCE_SQL = '''
+SELECT
+    m.id,
+    json_build_object(
+        'id', m.id,
+        'imdb_rating', m.imdb_rating,
+        'title', m.title,
+        'description', m.description,
+        'genre', (SELECT COALESCE(json_agg(e.value->>'name' ORDER BY e.n),
+                                  '[]')
+                  FROM json_array_elements(m.genres)
+                  WITH ORDINALITY AS e(value, n)),
+        'actors_names', (SELECT COALESCE(json_agg(e.value->>'name'
+                                                  ORDER BY e.n), '[]')
+                         FROM json_array_elements(m.actors)
+                         WITH ORDINALITY AS e(value, n)),
+        'writers_names', (SELECT COALESCE(json_agg(e.value->>'name'
+                                                   ORDER BY e.n), '[]')
+                          FROM json_array_elements(m.writers)
+                          WITH ORDINALITY AS e(value, n)),
+        'director', (SELECT COALESCE(json_agg(e.value->>'name'
+                                              ORDER BY e.n), '[]')
+                     FROM json_array_elements(m.directors)
+                     WITH ORDINALITY AS e(value, n)),
+        'actors', m.actors,
+        'writers', m.writers
+    ) AS _source
+FROM (''' + MERGE_SQL + ''') AS m
+'''
+
+# Документ остаётся текстом JSON и уходит в _bulk без разбора в Python.
+MERGE_RAW_SOURCE_SQL = '''
+SELECT d.id, d._source::text AS _source
+FROM (''' + MERGE_SOURCE_SQL + ''') AS d
+'''
+
 
 class ETLWorker:
 
-    def __init__(self, connection):
+    def __init__(self, connection, index_name: str = INDEX_NAME,
+                 transform: str = ETL_TRANSFORM,
+                 validate_sample: float = ETL_VALIDATE_SAMPLE,
+                 raw_json: bool = ETL_RAW_JSON,
+                 partition: Partition | None = None):
         self.connection = connection
+        self.partition = partition
+        self.index_name = index_name
+        self.transform = transform
+        self.validate_sample = validate_sample
+        self.raw_json = raw_json and transform == 'sql'
+        self.failed_tables = set()
+        self.counters = Counter()
+        self.film_ids = FilmIdSet(connection, FILM_IDS_SPILL_THRESHOLD)
 
     @coroutine
     def producer(self, next_node: Generator):
         """Производит извлечение изменений и отправляет их следующему узлу."""
         while producer_args := (yield):
-            last_updated_at, table = producer_args
-            self.fetch_and_send_changes(last_updated_at, table, next_node)
+            watermark, table = producer_args
+            self.fetch_and_send_changes(watermark, table, next_node)
 
     @coroutine
     def enricher(self, next_node: Generator, save_state: Generator):
-        """Обогащает изменения данными и отправляет их следующему узлу."""
+        """Обогащает изменения данными и отправляет их следующему узлу.
+
+        Фильмы изменившихся персон и жанров копятся за весь цикл опроса
+        и отправляются по одному разу, когда приходит (table, None)."""
+        checkpoint = None
         while enricher_args := (yield):
             table, rows = enricher_args
-            last_updated_at = rows[-1]['updated_at']
-            if table == Tables.FILM_WORK.value:
-                self.save_and_send_state(table, last_updated_at, save_state)
-                next_node.send((rows, last_updated_at))
+            if rows is None:
+                if checkpoint is not None:
+                    self.send_film_ids(checkpoint, next_node)
+                    save_state.send(checkpoint)
+                    checkpoint = None
+            elif table == Tables.FILM_WORK.value:
+                film_checkpoint = Checkpoint(table,
+                                             Watermark.from_row(rows[-1]))
+                next_node.send((rows, film_checkpoint))
+                save_state.send(film_checkpoint)
             else:
-                self.enrich_changes(table, rows, last_updated_at,
-                                    next_node, save_state)
+                self.enrich_changes(table, rows)
+                checkpoint = Checkpoint(table, Watermark.from_row(rows[-1]))
+
+    @coroutine
+    def notified_changes(self, next_node: Generator, save_state: Generator):
+        """Проталкивает id из NOTIFY через обогащение в загрузку.
+
+        Отметки таблиц здесь не двигаются: id приходят в произвольном
+        порядке, а полноту гарантирует страхующий опрос по отметкам."""
+        while notified_args := (yield):
+            table, ids = notified_args
+            ids = list(ids)
+            if table == Tables.FILM_WORK.value and self.partition:
+                ids = [film_id for film_id in ids
+                       if self.partition.contains(film_id)]
+            checkpoint = Checkpoint(table, watermark=None)
+            for start in range(0, len(ids), NUMBER_OF_FETCHED):
+                rows = [{'id': row_id} for row_id
+                        in ids[start:start + NUMBER_OF_FETCHED]]
+                if table == Tables.FILM_WORK.value:
+                    next_node.send((rows, checkpoint))
+                else:
+                    self.enrich_changes(table, rows)
+            if table != Tables.FILM_WORK.value:
+                self.send_film_ids(checkpoint, next_node)
+            save_state.send(checkpoint)
 
     @coroutine
     def merger(self, next_node: Generator):
         """Объединяет изменения и отправляет их следующему узлу."""
         while merger_args := (yield):
-            rows, last_updated_at = merger_args
-            self.merge_changes(rows, last_updated_at, next_node)
+            rows, checkpoint = merger_args
+            self.merge_changes(rows, checkpoint, next_node)
 
     @coroutine
     def transform_movies(self, next_node: Generator):
         """Преобразует фильмы и отправляет их следующему узлу."""
         while transform_args := (yield):
-            movie_dicts, last_updated_at = transform_args
+            movie_dicts, checkpoint = transform_args
             self.transform_and_send_movies(movie_dicts,
-                                           last_updated_at, next_node)
+                                           checkpoint, next_node)
 
     @coroutine
-    def load_movies_to_elasticsearch(self, client: Elasticsearch,
-                                     save_state_coro: Generator):
+    def load_movies_to_elasticsearch(self, bulk_loader: BulkLoader,
+                                     hash_index: DocumentHashIndex = None,
+                                     dead_letters: DeadLetterQueue = None):
         """Загружает фильмы в Elasticsearch и
-        отправляет состояние сохранения."""
+        отмечает неудачу в отметке пачки."""
         while loader_args := (yield):
-            movies = loader_args[0]
-            self.load_to_elasticsearch(client, movies, save_state_coro)
+            documents, checkpoint = loader_args
+            self.load_to_elasticsearch(bulk_loader, documents, checkpoint,
+                                       hash_index, dead_letters)
 
     @coroutine
     def save_state_coro(self, state: State):
-        """Сохраняет состояние и логирует его."""
-        while state_saver_args := (yield):
-            key_to_save, last_updated_at_to_save = state_saver_args
-            send_to_save = (yield)
-            if send_to_save:
-                self.log_and_save_state(state, last_updated_at_to_save)
-
-    def fetch_and_send_changes(self, last_updated_at: str, table: str, next_node: Generator) -> None:
-        """Извлекает изменения из таблицы и отправляет их следующему узлу."""
-        logger.info("Extracting changes from a table %s", table)
+        """Сохраняет отметку таблицы, если все её документы загружены.
+
+        После первой неудачи таблица до следующего опроса не сохраняется
+        и не дочитывается: следующий опрос начнёт с последней успешной
+        отметки. Пачки из NOTIFY приходят без отметки и только логируются.
+        """
+        while checkpoint := (yield):
+            if checkpoint.watermark is None:
+                if checkpoint.failed:
+                    logger.warning("Failed to index notified changes of %s",
+                                   checkpoint.table)
+            elif checkpoint.failed:
+                self.failed_tables.add(checkpoint.table)
+            elif checkpoint.table not in self.failed_tables:
+                self.log_and_save_state(state, checkpoint.table,
+                                        checkpoint.watermark)
+
+    def fetch_and_send_changes(self, watermark: Watermark, table: str,
+                               next_node: Generator) -> None:
+        """Извлекает изменения из таблицы постранично по ключу
+        (updated_at, id) и отправляет их следующему узлу."""
+        logger.debug("Extracting changes from a table %s", table)
+        self.failed_tables.discard(table)
+        partition_filter = ''
+        if table == Tables.FILM_WORK.value:
+            partition_filter = self.partition_filter('id')
         sql = f'''
         SELECT id, updated_at
         FROM content.{table}
-        WHERE updated_at > %s
-        ORDER BY updated_at
+        WHERE (updated_at, id) > (%s, %s) {partition_filter}
+        ORDER BY updated_at, id
+        LIMIT %s
         '''
-        with pg_cursor(self.connection) as cursor:
-            cursor.execute(sql, (last_updated_at,))
-            while rows := cursor.fetchmany(NUMBER_OF_FETCHED):
-                next_node.send((table, rows))
+        while True:
+            with pg_cursor(self.connection) as cursor:
+                cursor.execute(sql, (*watermark, NUMBER_OF_FETCHED))
+                rows = cursor.fetchall()
+            if not rows:
+                break
+            ROWS_EXTRACTED.inc(len(rows), table=table)
+            next_node.send((table, rows))
+            if len(rows) < NUMBER_OF_FETCHED or table in self.failed_tables:
+                break
+            watermark = Watermark.from_row(rows[-1])
+        next_node.send((table, None))
 
-    def save_and_send_state(self, table: str, last_updated_at: str, save_state: Generator) -> None:
-        """Сохраняет состояние и отправляет его следующему узлу."""
-        save_state.send((table, last_updated_at))
+    def partition_filter(self, column: str) -> str:
+        """Условие раздела воркера для WHERE или пустая строка."""
+        if self.partition is None:
+            return ''
+        return f'AND {self.partition.sql(column)}'
 
-    def enrich_changes(self, table: str, rows: list, last_updated_at: str,
-                       next_node: Generator, save_state: Generator) -> None:
-        """Обогащает изменения и отправляет их следующему узлу."""
-        logger.info("Enriching changes from the table %s", table)
+    def enrich_changes(self, table: str, rows: list) -> None:
+        """Добавляет фильмы изменившихся строк в множество цикла."""
+        logger.debug("Enriching changes from the table %s", table)
         sql = f'''
-        SELECT fw.id, fw.updated_at
+        SELECT fw.id
         FROM content.film_work fw
         LEFT JOIN content.{table}_film_work afw ON afw.film_work_id = fw.id
-        WHERE afw.{table}_id IN %s
-        ORDER BY fw.updated_at
+        WHERE afw.{table}_id = ANY(%s::uuid[])
+        {self.partition_filter('fw.id')}
         '''
         rows = preprocess_rows(rows)
-        with pg_cursor(self.connection) as cursor:
+        found = 0
+        with ENRICH_SECONDS.time(table=table), \
+                pg_server_cursor(self.connection, f'enrich_{table}',
+                                 ITERSIZE) as cursor:
             cursor.execute(sql, (rows,))
-            while rows := cursor.fetchmany(NUMBER_OF_FETCHED):
-                save_state.send((table, last_updated_at))
-                next_node.send((rows, last_updated_at))
+            while rows := cursor.fetchmany(cursor.itersize):
+                self.film_ids.add([row['id'] for row in rows])
+                found += len(rows)
+        ENRICH_FILMS.observe(found, table=table)
 
-    def merge_changes(self, rows: list, last_updated_at: str, next_node: Generator) -> None:
-        """Объединяет изменения и отправляет их следующему узлу."""
-        logger.info("Merging changes")
-        sql_ = '''
-        SELECT
-            fw.id,
-            fw.rating as imdb_rating,
-            fw.title,
-            fw.description,
-            fw.type,
-            COALESCE (
-               json_agg(
-                   DISTINCT jsonb_build_object(
-                       'id', g.id,
-                       'name', g.name
-                   )
-               ) FILTER (WHERE g.id is not null),
-               '[]'
-            ) as genres,
-            COALESCE (
-               json_agg(
-                   DISTINCT jsonb_build_object(
-                       'id', p.id,
-                       'name', p.full_name
-                   )
-               ) FILTER (WHERE p.id is not null AND pfw.role = 'director'),
-               '[]'
-            ) as directors,
-            COALESCE (
-               json_agg(
-                   DISTINCT jsonb_build_object(
-                       'id', p.id,
-                       'name', p.full_name
-                   )
-               ) FILTER (WHERE p.id is not null AND pfw.role = 'actor'),
-               '[]'
-            ) as actors,
-            COALESCE (
-               json_agg(
-                   DISTINCT jsonb_build_object(
-                       'id', p.id,
-                       'name', p.full_name
-                   )
-               ) FILTER (WHERE p.id is not null AND pfw.role = 'writer'),
-               '[]'
-            ) as writers
-        FROM
-            content.film_work fw
-        LEFT JOIN
-            content.person_film_work pfw ON pfw.film_work_id = fw.id
-        LEFT JOIN
-            content.person p ON p.id = pfw.person_id
-        LEFT JOIN
-            content.genre_film_work gfw ON gfw.film_work_id = fw.id
-        LEFT JOIN
-            content.genre g ON g.id = gfw.genre_id
-        WHERE
-           fw.id IN %s
-        GROUP BY
-            fw.id;
-        '''
+    def send_film_ids(self, checkpoint: Checkpoint,
+                      next_node: Generator) -> None:
+        """Отправляет накопленные фильмы следующему узлу по одному разу."""
+        self.counters['duplicates'] += self.film_ids.duplicates
+        self.film_ids.duplicates = 0
+        for ids in self.film_ids.chunks(NUMBER_OF_FETCHED):
+            next_node.send(([{'id': film_id} for film_id in ids],
+                            checkpoint))
+
+    def merge_changes(self, rows: list, checkpoint: Checkpoint,
+                      next_node: Generator) -> None:
+        """Объединяет изменения и отправляет их следующему узлу.
+        В режиме sql строки уже содержат готовый документ ES."""
+        logger.debug("Merging changes")
+        sql = MERGE_SQL
+        if self.raw_json:
+            sql = MERGE_RAW_SOURCE_SQL
+        elif self.transform == 'sql':
+            sql = MERGE_SOURCE_SQL
         rows = preprocess_rows(rows)
         with pg_cursor(self.connection) as cursor:
-            cursor.execute(sql_, (rows,))
+            with MERGE_SECONDS.time():
+                cursor.execute(sql, (rows,))
             while rows := cursor.fetchmany(NUMBER_OF_FETCHED):
-                next_node.send((rows, last_updated_at))
+                next_node.send((rows, checkpoint))
 
     def transform_and_send_movies(self, movie_dicts: list,
-                                  last_updated_at: str, next_node: Generator) -> None:
-        """Преобразует фильмы и отправляет их следующему узлу."""
-        logger.info("Converting movies from PostgreSQL")
+                                  checkpoint: Checkpoint,
+                                  next_node: Generator) -> None:
+        """Преобразует фильмы в документы ES и отправляет их
+        следующему узлу.
+
+        В режиме sql документы уже собраны запросом, и через pydantic
+        проверяется только доля validate_sample из них. С raw_json
+        документ остаётся текстом JSON из Postgres."""
+        logger.debug("Converting movies from PostgreSQL")
+        with TRANSFORM_SECONDS.time():
+            batch = self.build_documents(movie_dicts)
+        next_node.send((batch, checkpoint))
+
+    def build_documents(self, movie_dicts: list) -> list:
+        """Документы ES из строк объединяющего запроса."""
+        if self.transform == 'sql':
+            for row in movie_dicts:
+                self.check_document(row['_source'])
+            if self.raw_json:
+                return [RawDocument(row['id'], row['_source'])
+                        for row in movie_dicts]
+            return [row['_source'] for row in movie_dicts]
         batch = []
         for movie_dict in movie_dicts:
             movie = MovieRow(**movie_dict)
             movie.transform()
-            batch.append(movie)
-        next_node.send((batch, last_updated_at))
+            batch.append(movie.to_document())
+        return batch
 
-    def load_to_elasticsearch(self, client: Elasticsearch, movies: list,
-                              save_state_coro: Generator) -> None:
-        """Загружает фильмы в Elasticsearch и
-        отправляет состояние сохранения."""
-        logger.info("Uploading %d movies to ElasticSearch", len(movies))
-        data = [{
-            "_index": "movies",
-            "_id": row.id,
-            "_source": {
-                "id": row.id,
-                "imdb_rating": row.imdb_rating,
-                "title": row.title,
-                "description": row.description,
-                "genre": row.genres_names,
-                "actors_names": row.actors_names,
-                "writers_names": row.writers_names,
-                "director": row.directors_names,
-                "actors": [dict(actor) for actor in row.actors],
-                "writers": [dict(writer) for writer in row.writers],
-            }
-        } for row in movies]
-        _, errors = helpers.bulk(client, actions=data)
-        save_state_coro.send(not errors)
-
-    def log_and_save_state(self, state: Generator, last_updated_at_to_save: str) -> None:
-        """Логирует и сохраняет состояние."""
-        logger.info("The last state: %s: %s",
-                    STATE_KEY, state.get_state(STATE_KEY))
-        state.set_state(f"{STATE_KEY}", last_updated_at_to_save)
+    def check_document(self, document: dict | str) -> None:
+        """Выборочно проверяет документ по схеме MovieDocument.
+
+        Неверный документ только логируется и всё равно отправляется,
+        как и непроверенные: решает схема индекса, а отклонённый ES
+        документ попадает в очередь недоставленных, а не пропадает
+        за сдвинутой отметкой."""
+        if random() >= self.validate_sample:
+            return
+        if isinstance(document, str):
+            document = json.loads(document)
+        try:
+            MovieDocument(**document)
+        except ValidationError:
+            self.counters['invalid'] += 1
+            logger.exception("Invalid document %s", document.get('id'))
+
+    def load_to_elasticsearch(self, bulk_loader: BulkLoader,
+                              documents: list, checkpoint: Checkpoint,
+                              hash_index: DocumentHashIndex = None,
+                              dead_letters: DeadLetterQueue = None) -> None:
+        """Загружает фильмы в Elasticsearch и отмечает неудачу
+        в отметке пачки. Ошибки самих документов только логируются:
+        их повтор ничего не изменит, а отметку они держать не должны.
+
+        С dead_letters документы, отклонённые самим ES, откладываются
+        туда вместе с ошибкой. Временные ошибки и ошибки всего запроса
+        (503, кластер недоступен, 429 после всех повторов) по-прежнему
+        держат отметку: иначе короткий сбой ES переложил бы в очередь
+        целые окна опроса. С hash_index документы, не изменившиеся
+        с прошлой записи, не отправляются."""
+        data = [self.to_action(document) for document in documents]
+        hashes = {}
+        if hash_index is not None:
+            hashes = hash_index.changed({
+                str(action["_id"]): document_hash(action["_source"])
+                for action in data})
+            data = [action for action in data
+                    if str(action["_id"]) in hashes]
+        self.counters['skipped'] += len(documents) - len(data)
+        DOCUMENTS.inc(len(documents) - len(data), result='skipped')
+        if not data:
+            return
+        logger.debug("Uploading %d movies to ElasticSearch", len(data))
+        transient, failed = bulk_loader.load(data)
+        rejected = {str(info.get('_id')) for info in transient + failed}
+        if transient:
+            checkpoint.failed = True
+        if dead_letters is not None:
+            if failed:
+                dead_letters.put(data, failed)
+                logger.warning("Moved %d documents to the dead letter "
+                               "queue", len(failed))
+            dead_letters.discard([action['_id'] for action in data
+                                  if str(action['_id']) not in rejected])
+        for doc_id in rejected:
+            hashes.pop(doc_id, None)
+        self.counters['written'] += len(data) - len(transient) - len(failed)
+        DOCUMENTS.inc(len(data) - len(transient) - len(failed),
+                      result='written')
+        if hash_index is not None:
+            hash_index.remember(hashes)
+
+    def to_action(self, document: dict | RawDocument) -> dict:
+        """Действие _bulk для документа."""
+        if isinstance(document, RawDocument):
+            return {"_index": self.index_name, "_id": document.id,
+                    "_source": document.source}
+        return {"_index": self.index_name, "_id": document["id"],
+                "_source": document}
+
+    def log_and_save_state(self, state: State, table: str,
+                           watermark: Watermark) -> None:
+        """Логирует и сохраняет отметку таблицы."""
+        logger.debug("The last state: %s: %s",
+                     table, state.get_watermark(table))
+        state.set_watermark(table, watermark)
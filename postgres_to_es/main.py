@@ -1,23 +1,39 @@
-from datetime import datetime
-from time import sleep
+import atexit
+from time import monotonic, sleep
 
 import backoff
 import elastic_transport
 import psycopg2
 from elasticsearch import Elasticsearch
 
+from config.bulk import BulkLoader
 from config.choices import Tables
 import logging
+from config.listener import ChangeListener
+from config.logs import setup_logging
+from config.metrics import REGISTRY, STATE_LAG, start_http_server
 from config.pg_connection_helpers import pg_connector
+from config.serializers import es_serializers
+from config.stages import ThreadedStage
 from config.utils import create_index_if_not_exists
 from config.worker import ETLWorker
-from settings import (ELASTIC_CLIENT, INDEX_NAME, INDEX_PATH, PG_CONF,
-                      REFRESH_INTERVAL, STATE_KEY, STATE_PATH)
+from settings import (DEAD_LETTER_PATH, DEAD_LETTER_QUEUE, ELASTIC_CLIENT,
+                      ES_BULK_MAX_BYTES, ES_BULK_MAX_RETRIES, ES_BULK_MODE,
+                      ETL_CONCURRENT, ETL_MODE, ETL_QUEUE_SIZE,
+                      HASH_INDEX_PATH, INDEX_NAME, INDEX_PATH, LOG_FORMAT,
+                      METRICS_PORT, NOTIFY_CHANNEL, NOTIFY_DEBOUNCE,
+                      NOTIFY_FALLBACK_INTERVAL, NOTIFY_MAX_BATCH, PG_CONF,
+                      SKIP_UNCHANGED, STATE_DB_PATH, STATE_FLUSH_INTERVAL,
+                      STATE_KEY, STATE_PATH, STATE_STORAGE,
+                      TABLE_REFRESH_INTERVALS)
+from state.base_storage import BaseStorage
+from state.dead_letters import DeadLetterQueue
+from state.hash_index import DocumentHashIndex
 from state.json_file_storage import JsonFileStorage
 from state.models import State
+from state.sqlite_storage import SQLiteStorage
 
-logging.basicConfig(level=logging.DEBUG,
-                    format='%(asctime)s - %(levelname)s: %(message)s')
+setup_logging()
 
 logger = logging.getLogger(__name__)
 
@@ -25,46 +41,154 @@ logger = logging.getLogger(__name__)
 @backoff.on_exception(backoff.constant,
                       (psycopg2.OperationalError,
                        elastic_transport.ConnectionError), max_tries=1000)
-def start_etl_process(etl_worker, producer, state):
+def start_etl_process(etl_worker, es_client, state, listener=None,
+                      stages=(), hash_index=None, dead_letters=None):
     """Запускает процесс ETL, извлекая, обогащая,
-    объединяя, преобразуя и загружая данные."""
+    объединяя, преобразуя и загружая данные.
+
+    Каждая таблица опрашивается со своим интервалом
+    из TABLE_REFRESH_INTERVALS и от своей отметки. Если передан listener,
+    между опросами изменения из NOTIFY сразу уходят в конвейер,
+    а опрос становится редкой страховкой от пропущенных уведомлений.
+    Конвейер собирается заново при каждом перезапуске после ошибки:
+    упавшие корутины продолжить нельзя."""
+    producer, notified = build_pipeline(etl_worker, es_client, state,
+                                        stages, hash_index=hash_index,
+                                        dead_letters=dead_letters)
+    intervals = TABLE_REFRESH_INTERVALS
+    if listener is not None:
+        intervals = {table.value: NOTIFY_FALLBACK_INTERVAL
+                     for table in Tables}
+    next_poll = {table: 0.0 for table in Tables}
     while True:
         for table in Tables:
-            logger.info('Starting the ETL process for the table %s', table.value)
-            producer.send((state.get_state(STATE_KEY)
-                           or str(datetime.min), table.value))
-
-        sleep(REFRESH_INTERVAL)
+            if next_poll[table] > monotonic():
+                continue
+            logger.debug('Starting the ETL process for the table %s',
+                         table.value)
+            producer.send((state.get_watermark(table.value), table.value))
+            next_poll[table] = monotonic() + intervals[table.value]
+
+        for stage in stages:
+            stage.join()
+        state.flush()
+        for table in Tables:
+            STATE_LAG.set(state.get_watermark(table.value).lag(),
+                          table=table.value)
+        log_round(etl_worker)
+        timeout = max(0.0, min(next_poll.values()) - monotonic())
+        if listener is None:
+            sleep(timeout)
+            continue
+        for table, ids in listener.wait(timeout).items():
+            logger.debug('Notified about %d changes in %s', len(ids), table)
+            notified.send((table, ids))
+
+
+def log_round(etl_worker: ETLWorker) -> None:
+    """Итоги цикла. В формате json к записи прикладывается снимок
+    всех метрик, и лог заменяет страницу /metrics."""
+    if not etl_worker.counters:
+        return
+    extra = {}
+    if LOG_FORMAT == 'json':
+        extra['metrics'] = REGISTRY.snapshot()
+    logger.info("Documents written: %d, skipped as unchanged: %d, "
+                "duplicate film ids dropped: %d",
+                etl_worker.counters['written'],
+                etl_worker.counters['skipped'],
+                etl_worker.counters['duplicates'], extra=extra)
+    etl_worker.counters.clear()
+
+
+def build_pipeline(etl_worker: ETLWorker, es_client: Elasticsearch,
+                   state: State, stages=(),
+                   hash_index: DocumentHashIndex = None,
+                   dead_letters: DeadLetterQueue = None):
+    """Собирает цепочку корутин ETL и возвращает её входы:
+    для опроса по отметкам и для изменений из NOTIFY.
+
+    Если переданы ступени (преобразование, загрузка), узлы за ними
+    работают в их потоках. Отметки идут через те же очереди, что и пачки,
+    поэтому сохраняются строго после загрузки своих пачек."""
+    state_saver_ = etl_worker.save_state_coro(state)
+    bulk_loader = BulkLoader(es_client, mode=ES_BULK_MODE,
+                             max_bytes=ES_BULK_MAX_BYTES,
+                             max_retries=ES_BULK_MAX_RETRIES)
+    loader_ = etl_worker.load_movies_to_elasticsearch(bulk_loader,
+                                                      hash_index,
+                                                      dead_letters)
+    if stages:
+        transform_stage, load_stage = stages
+        loader_ = load_stage.wrap(loader_)
+        state_saver_ = load_stage.wrap(state_saver_)
+    transformer_ = etl_worker.transform_movies(next_node=loader_)
+    if stages:
+        transformer_ = transform_stage.wrap(transformer_)
+        state_saver_ = transform_stage.wrap(state_saver_)
+    merger_ = etl_worker.merger(next_node=transformer_)
+    enricher_ = etl_worker.enricher(next_node=merger_,
+                                    save_state=state_saver_)
+    return (etl_worker.producer(next_node=enricher_),
+            etl_worker.notified_changes(next_node=merger_,
+                                        save_state=state_saver_))
+
+
+def create_stages() -> tuple:
+    """Ступени конкурентного конвейера: преобразование и загрузка."""
+    if not ETL_CONCURRENT:
+        return ()
+    return (ThreadedStage('transform', ETL_QUEUE_SIZE),
+            ThreadedStage('load', ETL_QUEUE_SIZE))
+
+
+def create_storage() -> BaseStorage:
+    """Хранилище состояния по настройке STATE_STORAGE."""
+    if STATE_STORAGE == 'sqlite':
+        return SQLiteStorage(STATE_DB_PATH)
+    return JsonFileStorage(STATE_PATH)
 
 
 def main():
     """Основная функция, инициализирующая и запускающая ETL-процесс."""
     logger.info("Initializing the state")
-    state = State(JsonFileStorage(STATE_PATH))
+    state = State(create_storage(), key_prefix=STATE_KEY,
+                  flush_interval=STATE_FLUSH_INTERVAL)
+    atexit.register(state.flush)
+
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT)
 
     sleep(10)
-    es_client = Elasticsearch(ELASTIC_CLIENT['host'])
+    es_client = Elasticsearch(ELASTIC_CLIENT['host'],
+                              serializers=es_serializers())
+
+    hash_index = None
+    if SKIP_UNCHANGED:
+        hash_index = DocumentHashIndex(HASH_INDEX_PATH)
 
     logger.info("Creating an ES index if there is none")
-    create_index_if_not_exists(es_client,
-                               index_path=INDEX_PATH,
-                               index_name=INDEX_NAME)
+    created = create_index_if_not_exists(es_client,
+                                         index_path=INDEX_PATH,
+                                         index_name=INDEX_NAME)
+    if created and hash_index is not None:
+        # В новом индексе нет ничего из того, что помнят хеши.
+        hash_index.clear()
+
+    dead_letters = None
+    if DEAD_LETTER_QUEUE:
+        dead_letters = DeadLetterQueue(DEAD_LETTER_PATH)
 
     logger.info("Connecting to PostgreSQL")
     with pg_connector(PG_CONF) as conn:
         etl_worker = ETLWorker(conn)
         logger.info("Initialization")
-
-        state_saver_ = etl_worker.save_state_coro(state)
-        loader_ = etl_worker.load_movies_to_elasticsearch(es_client,
-                                                          state_saver_)
-        transformer_ = etl_worker.transform_movies(next_node=loader_)
-        merger_ = etl_worker.merger(next_node=transformer_)
-        enricher_ = etl_worker.enricher(next_node=merger_,
-                                        save_state=state_saver_)
-        producer_ = etl_worker.producer(next_node=enricher_)
-
-        start_etl_process(etl_worker, producer_, state)
+        listener = None
+        if ETL_MODE == 'notify':
+            listener = ChangeListener(PG_CONF, NOTIFY_CHANNEL,
+                                      NOTIFY_DEBOUNCE, NOTIFY_MAX_BATCH)
+        start_etl_process(etl_worker, es_client, state, listener,
+                          create_stages(), hash_index, dead_letters)
 
 
 if __name__ == '__main__':
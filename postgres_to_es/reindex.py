@@ -0,0 +1,146 @@
+"""Полная переиндексация без простоя.
+
+Каталог заливается в новый индекс <INDEX_NAME>_v<n> с отключённым
+refresh и без реплик, затем настройки возвращаются, индекс сливается
+в один сегмент, и псевдоним INDEX_NAME атомарно переключается на него.
+Поиск до переключения видит старый индекс целиком.
+
+    python reindex.py [--delete-old]
+"""
+import argparse
+import logging
+import re
+import tempfile
+from datetime import datetime
+
+from elasticsearch import Elasticsearch
+
+from config.choices import Tables
+from config.logs import setup_logging
+from config.pg_connection_helpers import pg_connector, pg_cursor
+from config.serializers import es_serializers
+from config.stages import ThreadedStage
+from config.utils import load_index_body
+from config.worker import ETLWorker
+from main import build_pipeline
+from settings import (ELASTIC_CLIENT, ETL_QUEUE_SIZE, INDEX_NAME, INDEX_PATH,
+                      PG_CONF)
+from state.json_file_storage import JsonFileStorage
+from state.models import State, Watermark
+
+setup_logging()
+
+logger = logging.getLogger(__name__)
+
+# Параметры индекса на время заливки.
+BULK_SETTINGS = {'refresh_interval': '-1', 'number_of_replicas': 0}
+
+
+def next_index_name(client: Elasticsearch, alias: str) -> str:
+    """Имя следующей версии индекса: <alias>_v<n + 1>."""
+    pattern = re.compile(rf'^{re.escape(alias)}_v(\d+)$')
+    versions = [int(match.group(1))
+                for name in client.indices.get(index=f'{alias}_v*')
+                if (match := pattern.match(name))]
+    return f'{alias}_v{max(versions, default=0) + 1}'
+
+
+def current_indices(client: Elasticsearch, alias: str) -> list[str]:
+    """Индексы, на которые сейчас указывает псевдоним."""
+    if client.indices.exists_alias(name=alias):
+        return list(client.indices.get_alias(name=alias))
+    return []
+
+
+def load_changes(conn, client: Elasticsearch, index_name: str,
+                 tables, since: str | None = None) -> None:
+    """Прогоняет изменения таблиц начиная с since через конкурентный
+    конвейер с загрузкой в index_name."""
+    etl_worker = ETLWorker(conn, index_name=index_name)
+    stages = (ThreadedStage('transform', ETL_QUEUE_SIZE),
+              ThreadedStage('load', ETL_QUEUE_SIZE))
+    with tempfile.TemporaryDirectory() as tmp:
+        state = State(JsonFileStorage(f'{tmp}/state.json'))
+        producer, _ = build_pipeline(etl_worker, client, state, stages)
+        for table in tables:
+            producer.send((Watermark.initial(since), table.value))
+        for stage in stages:
+            stage.join()
+    if etl_worker.failed_tables:
+        raise RuntimeError(
+            f'Failed to index {", ".join(etl_worker.failed_tables)}')
+
+
+def database_now(conn) -> str:
+    with pg_cursor(conn) as cursor:
+        cursor.execute('SELECT clock_timestamp()')
+        return str(cursor.fetchone()[0])
+
+
+def reindex(client: Elasticsearch, conn, delete_old: bool = False) -> str:
+    """Строит новую версию индекса и переключает на неё псевдоним.
+
+    Изменения, сделанные во время заливки, догоняются до переключения,
+    а сделанные во время переключения — сразу после него."""
+    body = load_index_body(INDEX_PATH)
+    live_settings = body.get('settings', {})
+    index_name = next_index_name(client, INDEX_NAME)
+
+    logger.info("Creating the index %s", index_name)
+    client.indices.create(index=index_name, body={
+        **body, 'settings': {**live_settings, **BULK_SETTINGS}})
+    try:
+        started = database_now(conn)
+        logger.info("Loading the catalog into %s", index_name)
+        load_changes(conn, client, index_name, [Tables.FILM_WORK])
+        caught_up = database_now(conn)
+        logger.info("Catching up changes since %s", started)
+        load_changes(conn, client, index_name, Tables, since=started)
+    except Exception:
+        logger.exception("Reindex failed, removing %s", index_name)
+        client.indices.delete(index=index_name)
+        raise
+
+    logger.info("Restoring settings and force-merging %s", index_name)
+    client.indices.put_settings(index=index_name, settings={
+        'refresh_interval': live_settings.get('refresh_interval', '1s'),
+        'number_of_replicas': live_settings.get('number_of_replicas', 1),
+    })
+    client.indices.refresh(index=index_name)
+    client.indices.forcemerge(index=index_name, max_num_segments=1)
+
+    old_indices = current_indices(client, INDEX_NAME)
+    actions = [{'remove': {'index': old, 'alias': INDEX_NAME}}
+               for old in old_indices]
+    if not old_indices and client.indices.exists(index=INDEX_NAME):
+        # Индекс старого формата без псевдонима удаляется в том же
+        # атомарном запросе, что и добавление псевдонима с его именем.
+        actions.append({'remove_index': {'index': INDEX_NAME}})
+    actions.append({'add': {'index': index_name, 'alias': INDEX_NAME}})
+    logger.info("Switching the alias %s to %s", INDEX_NAME, index_name)
+    client.indices.update_aliases(actions=actions)
+
+    load_changes(conn, client, INDEX_NAME, Tables, since=caught_up)
+    if delete_old and old_indices:
+        logger.info("Deleting %s", ', '.join(old_indices))
+        client.indices.delete(index=','.join(old_indices))
+    return index_name
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--delete-old', action='store_true',
+                        help='удалить индексы, с которых снят псевдоним')
+    args = parser.parse_args()
+
+    es_client = Elasticsearch(ELASTIC_CLIENT['host'],
+                              serializers=es_serializers())
+    with pg_connector(PG_CONF) as conn:
+        started = datetime.now()
+        index_name = reindex(es_client, conn, args.delete_old)
+    logger.info("Reindexed into %s in %s", index_name,
+                datetime.now() - started)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""Повтор документов из очереди недоставленных (DEAD_LETTER_PATH).
+
+По умолчанию в _bulk пачками отправляется сохранённый текст документов.
+С --rebuild документы заново собираются из текущих данных Postgres:
+так исправленный в базе фильм уходит в индекс в новом виде.
+Записанные документы из очереди удаляются, снова отклонённые остаются
+в ней с увеличенным числом попыток.
+
+    python retry_dlq.py [--rebuild] [--max-attempts N] [--batch-size N]
+"""
+import argparse
+import logging
+import tempfile
+
+from elasticsearch import Elasticsearch
+
+from config.bulk import BulkLoader
+from config.choices import Tables
+from config.logs import setup_logging
+from config.pg_connection_helpers import pg_connector
+from config.serializers import es_serializers
+from config.worker import ETLWorker
+from main import build_pipeline
+from settings import (DEAD_LETTER_PATH, ELASTIC_CLIENT, ES_BULK_MAX_BYTES,
+                      ES_BULK_MAX_RETRIES, ES_BULK_MODE, PG_CONF)
+from state.dead_letters import DeadLetterQueue
+from state.json_file_storage import JsonFileStorage
+from state.models import State
+
+setup_logging()
+
+logger = logging.getLogger(__name__)
+
+
+def replay(client: Elasticsearch, dead_letters: DeadLetterQueue,
+           batch_size: int, max_attempts: int | None = None) -> None:
+    """Отправляет сохранённые документы в том виде, в каком они
+    не были приняты."""
+    bulk_loader = BulkLoader(client, mode=ES_BULK_MODE,
+                             max_bytes=ES_BULK_MAX_BYTES,
+                             max_retries=ES_BULK_MAX_RETRIES)
+    for actions in dead_letters.batches(batch_size, max_attempts):
+        transient, failed = bulk_loader.load(actions)
+        errors = transient + failed
+        rejected = {str(info.get('_id')) for info in errors}
+        dead_letters.put(actions, errors)
+        dead_letters.discard([action['_id'] for action in actions
+                              if action['_id'] not in rejected])
+
+
+def rebuild(client: Elasticsearch, conn, dead_letters: DeadLetterQueue,
+            batch_size: int, max_attempts: int | None = None) -> None:
+    """Собирает документы заново из Postgres и загружает их тем же
+    конвейером, что и ETL. Фильмы, удалённые из базы, остаются
+    в очереди."""
+    etl_worker = ETLWorker(conn)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Отметки таблиц повтор не двигает.
+        state = State(JsonFileStorage(f'{tmp}/state.json'))
+        _, notified = build_pipeline(etl_worker, client, state,
+                                     dead_letters=dead_letters)
+        for actions in dead_letters.batches(batch_size, max_attempts):
+            notified.send((Tables.FILM_WORK.value,
+                           [action['_id'] for action in actions]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rebuild', action='store_true',
+                        help='собрать документы заново из Postgres')
+    parser.add_argument('--max-attempts', type=int, default=None,
+                        help='пропускать документы с большим числом попыток')
+    parser.add_argument('--batch-size', type=int, default=1000)
+    args = parser.parse_args()
+
+    es_client = Elasticsearch(ELASTIC_CLIENT['host'],
+                              serializers=es_serializers())
+    dead_letters = DeadLetterQueue(DEAD_LETTER_PATH)
+    pending = len(dead_letters)
+    logger.info("Retrying %d dead letters", pending)
+    if args.rebuild:
+        with pg_connector(PG_CONF) as conn:
+            rebuild(es_client, conn, dead_letters, args.batch_size,
+                    args.max_attempts)
+    else:
+        replay(es_client, dead_letters, args.batch_size, args.max_attempts)
+    logger.info("Indexed %d, %d left in the queue",
+                pending - len(dead_letters), len(dead_letters))
+
+
+if __name__ == '__main__':
+    main()
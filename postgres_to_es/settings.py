@@ -6,7 +6,20 @@ from dotenv import load_dotenv, find_dotenv
 load_dotenv(find_dotenv())
 
 REFRESH_INTERVAL = 10
+# Горячие таблицы опрашиваются чаще холодных.
+TABLE_REFRESH_INTERVALS = {
+    'film_work': int(os.environ.get('FILM_WORK_REFRESH_INTERVAL', REFRESH_INTERVAL)),
+    'person': int(os.environ.get('PERSON_REFRESH_INTERVAL', REFRESH_INTERVAL * 3)),
+    'genre': int(os.environ.get('GENRE_REFRESH_INTERVAL', REFRESH_INTERVAL * 6)),
+}
 LOGGER_PATH = "logger.conf"
+# text или json — одна запись лога на строку JSON. На DEBUG пишется
+# каждая пачка каждой ступени, на INFO — только итоги цикла.
+LOG_FORMAT = os.environ.get('LOG_FORMAT', 'text')
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+# Порт страницы /metrics в формате Prometheus, 0 — не запускать.
+# В sharded.py процесс N слушает METRICS_PORT + N.
+METRICS_PORT = int(os.environ.get('METRICS_PORT', 9108))
 
 PG_CONF = {
     'dbname': os.environ.get('DB_NAME'),
@@ -20,10 +33,62 @@ ELASTIC_CLIENT = {
     'host': f'http://{os.environ.get("ELASTIC_HOST")}:{os.environ.get("ELASTIC_POST")}'
 }
 
+# poll — только опрос по отметкам, notify — LISTEN/NOTIFY и редкий опрос.
+ETL_MODE = os.environ.get('ETL_MODE', 'poll')
+NOTIFY_CHANNEL = 'content_changes'
+NOTIFY_DEBOUNCE = float(os.environ.get('NOTIFY_DEBOUNCE', 0.5))
+NOTIFY_MAX_BATCH = 1000
+NOTIFY_FALLBACK_INTERVAL = int(os.environ.get('NOTIFY_FALLBACK_INTERVAL', 300))
+
+# Преобразование и загрузка в ES в отдельных потоках, чтобы они шли
+# одновременно с чтением из Postgres. Размер очереди ограничивает
+# число пачек между ступенями.
+ETL_CONCURRENT = os.environ.get('ETL_CONCURRENT') == 'True'
+ETL_QUEUE_SIZE = int(os.environ.get('ETL_QUEUE_SIZE', 8))
+
+# bulk — запросы по очереди, streaming — потоково.
+ES_BULK_MODE = os.environ.get('ES_BULK_MODE', 'bulk')
+# Наибольший размер одного запроса _bulk.
+ES_BULK_MAX_BYTES = int(os.environ.get('ES_BULK_MAX_BYTES', 5 * 1024 * 1024))
+ES_BULK_MAX_RETRIES = int(os.environ.get('ES_BULK_MAX_RETRIES', 5))
+
+# sharded.py: процессов в контейнере и разделов по хешу film_work.id.
+# Число разделов должно совпадать во всех контейнерах.
+ETL_WORKERS = int(os.environ.get('ETL_WORKERS', 2))
+ETL_PARTITIONS = int(os.environ.get('ETL_PARTITIONS', 8))
+ETL_REBALANCE_INTERVAL = int(os.environ.get('ETL_REBALANCE_INTERVAL', 10))
+
 STATE_KEY = 'last_movies_updated'
+STATE_STORAGE = os.environ.get('STATE_STORAGE', 'json')
 STATE_PATH = 'storage.json'
+STATE_DB_PATH = 'storage.sqlite'
+# Не чаще чем раз в столько секунд состояние пишется на диск.
+STATE_FLUSH_INTERVAL = float(os.environ.get('STATE_FLUSH_INTERVAL', 1))
+
+# sql — документ ES собирается запросом, pydantic — через MovieRow.
+ETL_TRANSFORM = os.environ.get('ETL_TRANSFORM', 'sql')
+# Доля документов, которые в режиме sql проверяются через pydantic.
+ETL_VALIDATE_SAMPLE = float(os.environ.get('ETL_VALIDATE_SAMPLE', 0.01))
+# В режиме sql передавать документы в _bulk текстом JSON из Postgres,
+# не разбирая и не кодируя их заново.
+ETL_RAW_JSON = os.environ.get('ETL_RAW_JSON') == 'True'
+
+# Документы, не изменившиеся с прошлой записи, в ES не отправляются.
+SKIP_UNCHANGED = os.environ.get('SKIP_UNCHANGED', 'True') == 'True'
+HASH_INDEX_PATH = 'hashes.sqlite'
+
+# Документы, которые ES отклонил из-за них самих, откладываются сюда
+# с ошибкой, а отметка идёт дальше. Сбои ES и отказы всего запроса
+# отметку держат. Повторяет отложенное python retry_dlq.py.
+DEAD_LETTER_QUEUE = os.environ.get('DEAD_LETTER_QUEUE', 'True') == 'True'
+DEAD_LETTER_PATH = 'dead_letters.sqlite'
 
 NUMBER_OF_FETCHED = 100
+# Сколько строк за раз читать из именованного курсора.
+ITERSIZE = int(os.environ.get('ITERSIZE', 2000))
+# Сколько id фильмов за цикл держать в памяти, прежде чем перенести
+# их во временную таблицу Postgres.
+FILM_IDS_SPILL_THRESHOLD = int(os.environ.get('FILM_IDS_SPILL_THRESHOLD', 100_000))
 
 INDEX_PATH = "config/schema.json"
 INDEX_NAME = "movies"
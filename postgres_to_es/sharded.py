@@ -0,0 +1,174 @@
+"""Многопроцессный ETL с разделами по хешу film_work.id.
+
+Координатор запускает ETL_WORKERS процессов. Каждый со своими
+соединениями с Postgres и Elasticsearch захватывает часть из
+ETL_PARTITIONS разделов и ведёт по ним отдельные отметки в таблице
+public.etl_state. Несколько контейнеров с одинаковым ETL_PARTITIONS
+делят разделы между собой, а разделы упавшего процесса подхватывают
+оставшиеся.
+
+    python sharded.py [--workers N] [--partitions P]
+"""
+import argparse
+import logging
+import multiprocessing
+import signal
+import sys
+from time import monotonic, sleep
+
+from elasticsearch import Elasticsearch
+
+from config.choices import Tables
+from config.logs import setup_logging
+from config.metrics import STATE_LAG, start_http_server
+from config.partitions import Partition, PartitionClaims
+from config.pg_connection_helpers import pg_connector
+from config.serializers import es_serializers
+from config.utils import create_index_if_not_exists, index_uuid
+from config.worker import ETLWorker
+from main import build_pipeline, log_round
+from settings import (DEAD_LETTER_PATH, DEAD_LETTER_QUEUE, ELASTIC_CLIENT,
+                      ETL_PARTITIONS, ETL_REBALANCE_INTERVAL, ETL_WORKERS,
+                      HASH_INDEX_PATH, INDEX_NAME, INDEX_PATH, METRICS_PORT,
+                      PG_CONF, SKIP_UNCHANGED, STATE_FLUSH_INTERVAL, STATE_KEY,
+                      TABLE_REFRESH_INTERVALS)
+from state.dead_letters import DeadLetterQueue
+from state.hash_index import DocumentHashIndex
+from state.models import State
+from state.postgres_storage import PostgresStorage
+
+setup_logging()
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionRunner:
+    """Конвейер ETL одного раздела со своими отметками."""
+
+    def __init__(self, conn, es_client: Elasticsearch, state_conn,
+                 partition: Partition,
+                 dead_letters: DeadLetterQueue = None) -> None:
+        self.partition = partition
+        self.etl_worker = ETLWorker(conn, partition=partition)
+        scope = f'{partition.count}:{partition.index}'
+        self.state = State(PostgresStorage(state_conn, scope),
+                           key_prefix=STATE_KEY,
+                           flush_interval=STATE_FLUSH_INTERVAL)
+        hash_index = None
+        if SKIP_UNCHANGED:
+            hash_index = self.resume_hash_index(es_client, scope)
+        self.producer, _ = build_pipeline(self.etl_worker, es_client,
+                                          self.state, hash_index=hash_index,
+                                          dead_letters=dead_letters)
+        self.next_poll = {table: 0.0 for table in Tables}
+
+    def resume_hash_index(self, es_client: Elasticsearch,
+                          scope: str) -> DocumentHashIndex:
+        """Локальные хеши раздела. Каждый захват раздела получает
+        номер из общего состояния. Хеши переживают повторный захват,
+        если раздел с прошлого захвата этого контейнера никто другой
+        не брал и индекс ES тот же; иначе документы могли измениться
+        без нас, и хеши забываются."""
+        claim = (self.state.get_state('claims') or 0) + 1
+        self.state.set_state('claims', claim)
+        self.state.flush()
+        index = index_uuid(es_client, INDEX_NAME)
+        hash_index = DocumentHashIndex(HASH_INDEX_PATH.replace(
+            '.sqlite', f'.p{scope.replace(":", "-")}.sqlite'))
+        if not hash_index.resume(f'{index}:{claim - 1}',
+                                 f'{index}:{claim}'):
+            logger.info("Partition %s: document hashes reset", scope)
+        return hash_index
+
+    def poll(self) -> None:
+        """Опрашивает таблицы, для которых подошёл срок."""
+        for table in Tables:
+            if self.next_poll[table] > monotonic():
+                continue
+            self.producer.send((self.state.get_watermark(table.value),
+                                table.value))
+            self.next_poll[table] = (monotonic()
+                                     + TABLE_REFRESH_INTERVALS[table.value])
+        self.state.flush()
+        log_round(self.etl_worker)
+
+
+def run_worker(partitions: int, slot: int) -> None:
+    """Цикл процесса: перераспределить разделы и опросить свои.
+    Метрики процесса отдаются на порту METRICS_PORT + slot."""
+    if METRICS_PORT:
+        start_http_server(METRICS_PORT + slot)
+    es_client = Elasticsearch(ELASTIC_CLIENT['host'],
+                              serializers=es_serializers())
+    claims = PartitionClaims(PG_CONF, partitions)
+    dead_letters = None
+    if DEAD_LETTER_QUEUE:
+        # Одна очередь на контейнер: её разбирает retry_dlq.py.
+        dead_letters = DeadLetterQueue(DEAD_LETTER_PATH)
+    runners = {}
+    with pg_connector(PG_CONF) as conn:
+        while True:
+            # Все отметки уже сброшены в конце poll(), поэтому
+            # отпускать разделы здесь безопасно.
+            claimed, released = claims.rebalance()
+            for index in released:
+                del runners[index]
+            for index in sorted(claimed):
+                runners[index] = PartitionRunner(
+                    conn, es_client, claims.connection,
+                    Partition(index, partitions), dead_letters)
+            for runner in runners.values():
+                runner.poll()
+            for table in Tables:
+                # Отставание процесса — по самому отставшему разделу.
+                STATE_LAG.set(max((runner.state.get_watermark(
+                    table.value).lag() for runner in runners.values()),
+                    default=0.0), table=table.value)
+            next_poll = min((min(runner.next_poll.values())
+                             for runner in runners.values()),
+                            default=monotonic() + ETL_REBALANCE_INTERVAL)
+            sleep(max(0.0, min(next_poll - monotonic(),
+                               ETL_REBALANCE_INTERVAL)))
+
+
+def start_process(partitions: int, slot: int) -> multiprocessing.Process:
+    process = multiprocessing.Process(target=run_worker,
+                                      args=(partitions, slot))
+    process.start()
+    return process
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=ETL_WORKERS)
+    parser.add_argument('--partitions', type=int, default=ETL_PARTITIONS)
+    args = parser.parse_args()
+
+    create_index_if_not_exists(
+        Elasticsearch(ELASTIC_CLIENT['host'], serializers=es_serializers()),
+        index_path=INDEX_PATH, index_name=INDEX_NAME)
+    with pg_connector(PG_CONF) as conn:
+        PostgresStorage.create_table(conn)
+    processes = [start_process(args.partitions, slot)
+                 for slot in range(args.workers)]
+
+    def stop(*_):
+        for process in processes:
+            process.terminate()
+        sys.exit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    logger.info("Started %d workers for %d partitions",
+                args.workers, args.partitions)
+    while True:
+        sleep(ETL_REBALANCE_INTERVAL)
+        for slot, process in enumerate(processes):
+            if not process.is_alive():
+                logger.warning("Worker %s exited with %s, restarting",
+                               process.name, process.exitcode)
+                processes[slot] = start_process(args.partitions, slot)
+
+
+if __name__ == '__main__':
+    main()
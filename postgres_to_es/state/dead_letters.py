@@ -0,0 +1,90 @@
+import json
+import sqlite3
+import sys
+from datetime import datetime, timezone
+
+
+class DeadLetterQueue:
+    """Документы, которые Elasticsearch отклонил, вместе с ошибкой.
+
+    Хранятся в локальной базе SQLite по одной строке на документ:
+    повторная неудача того же документа заменяет его текст и ошибку
+    и увеличивает attempts. Пока документ лежит здесь, отметка таблицы
+    идёт дальше, а повторяет его отдельная команда retry_dlq.py.
+    """
+
+    def __init__(self, db_path: str = "dead_letters.sqlite") -> None:
+        self.db_path = db_path
+        # Пишет поток загрузки, а в sharded.py — несколько процессов.
+        self.connection = sqlite3.connect(db_path, check_same_thread=False,
+                                          timeout=30)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS dead_letter ('
+            'id TEXT PRIMARY KEY, index_name TEXT NOT NULL, '
+            'source TEXT NOT NULL, status INTEGER, error TEXT, '
+            'attempts INTEGER NOT NULL DEFAULT 1, failed_at TEXT NOT NULL)'
+        )
+        self.connection.commit()
+
+    def put(self, actions: list, errors: list) -> None:
+        """Сохраняет действия _bulk, по которым ES вернул ошибки."""
+        by_id = {str(info.get('_id')): info for info in errors}
+        failed_at = datetime.now(timezone.utc).isoformat()
+        rows = []
+        for action in actions:
+            info = by_id.get(str(action['_id']))
+            if info is None:
+                continue
+            source = action['_source']
+            if not isinstance(source, str):
+                source = json.dumps(source, ensure_ascii=False, default=str)
+            rows.append((str(action['_id']), action['_index'], source,
+                         info.get('status'),
+                         json.dumps(info.get('error'), default=str),
+                         failed_at))
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO dead_letter '
+                '(id, index_name, source, status, error, failed_at) '
+                'VALUES (?, ?, ?, ?, ?, ?) '
+                'ON CONFLICT (id) DO UPDATE SET '
+                'index_name = excluded.index_name, '
+                'source = excluded.source, status = excluded.status, '
+                'error = excluded.error, failed_at = excluded.failed_at, '
+                'attempts = dead_letter.attempts + 1',
+                rows
+            )
+
+    def discard(self, ids: list) -> None:
+        """Удаляет документы, которые всё-таки записаны: в том числе
+        более новые их версии, чтобы повтор не вернул старый текст.
+        Пустая очередь проверяется чтением, без записи на диск."""
+        if not ids or not self.connection.execute(
+                'SELECT 1 FROM dead_letter LIMIT 1').fetchone():
+            return
+        with self.connection:
+            self.connection.executemany(
+                'DELETE FROM dead_letter WHERE id = ?',
+                [(str(doc_id),) for doc_id in ids]
+            )
+
+    def batches(self, size: int, max_attempts: int | None = None):
+        """Отдаёт документы пачками действий _bulk по size штук.
+        Документы сверх max_attempts попыток пропускаются. Страницы
+        идут по ключу id, поэтому очередь можно менять на ходу."""
+        last_id = ''
+        while True:
+            rows = self.connection.execute(
+                'SELECT id, index_name, source FROM dead_letter '
+                'WHERE id > ? AND attempts <= ? ORDER BY id LIMIT ?',
+                (last_id, max_attempts or sys.maxsize, size)).fetchall()
+            if not rows:
+                break
+            yield [{'_index': index_name, '_id': doc_id, '_source': source}
+                   for doc_id, index_name, source in rows]
+            last_id = rows[-1][0]
+
+    def __len__(self) -> int:
+        return self.connection.execute(
+            'SELECT count(*) FROM dead_letter').fetchone()[0]
@@ -0,0 +1,79 @@
+import hashlib
+import json
+import sqlite3
+
+
+def document_hash(source: dict | str) -> str:
+    """Устойчивый хеш документа: не зависит от порядка ключей.
+    Документ, уже закодированный в JSON, хешируется как есть."""
+    if isinstance(source, str):
+        payload = source
+    else:
+        payload = json.dumps(source, sort_keys=True, separators=(',', ':'),
+                             ensure_ascii=False, default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class DocumentHashIndex:
+    """Хеши документов, уже записанных в Elasticsearch.
+
+    Хранятся в локальной базе SQLite рядом с состоянием. Документ
+    с тем же хешем повторно не отправляется.
+    """
+
+    def __init__(self, db_path: str = "hashes.sqlite") -> None:
+        self.db_path = db_path
+        # Пишет поток загрузки, а очищает основной поток при старте.
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS document_hash '
+            '(id TEXT PRIMARY KEY, hash TEXT NOT NULL)'
+        )
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS hash_epoch '
+            '(id INTEGER PRIMARY KEY CHECK (id = 1), epoch TEXT NOT NULL)'
+        )
+        self.connection.commit()
+
+    def changed(self, hashes: dict) -> dict:
+        """Оставляет из {id: хеш} только новые и изменённые документы."""
+        if not hashes:
+            return {}
+        placeholders = ', '.join('?' * len(hashes))
+        rows = self.connection.execute(
+            f'SELECT id, hash FROM document_hash '
+            f'WHERE id IN ({placeholders})', list(hashes))
+        known = dict(rows)
+        return {doc_id: doc_hash for doc_id, doc_hash in hashes.items()
+                if known.get(doc_id) != doc_hash}
+
+    def remember(self, hashes: dict) -> None:
+        """Запоминает хеши успешно записанных документов."""
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO document_hash (id, hash) VALUES (?, ?) '
+                'ON CONFLICT (id) DO UPDATE SET hash = excluded.hash',
+                hashes.items()
+            )
+
+    def resume(self, previous: str, current: str) -> bool:
+        """Продолжает хеши в эпохе current. Они остаются, только если
+        последней записанной была эпоха previous: иначе документы
+        между ними писал кто-то другой. Возвращает, остались ли хеши."""
+        with self.connection:
+            row = self.connection.execute(
+                'SELECT epoch FROM hash_epoch').fetchone()
+            kept = row is not None and row[0] == previous
+            if not kept:
+                self.connection.execute('DELETE FROM document_hash')
+            self.connection.execute(
+                'INSERT INTO hash_epoch (id, epoch) VALUES (1, ?) '
+                'ON CONFLICT (id) DO UPDATE SET epoch = excluded.epoch',
+                (current,))
+        return kept
+
+    def clear(self) -> None:
+        """Забывает все хеши, например после пересоздания индекса."""
+        with self.connection:
+            self.connection.execute('DELETE FROM document_hash')
@@ -1,4 +1,6 @@
 import json
+import os
+import tempfile
 
 from .base_storage import BaseStorage
 
@@ -6,7 +8,9 @@ from .base_storage import BaseStorage
 class JsonFileStorage(BaseStorage):
     """Реализация хранилища, использующего локальный файл.
 
-    Формат хранения: JSON
+    Формат хранения: JSON. Файл заменяется атомарно: состояние пишется
+    во временный файл рядом, сбрасывается на диск и переименовывается,
+    поэтому при падении остаётся либо старая, либо новая версия целиком.
     """
 
     def __init__(self, file_path: str = "storage.json") -> None:
@@ -14,15 +18,20 @@ class JsonFileStorage(BaseStorage):
 
     def save_state(self, state: dict) -> None:
         """Сохранить состояние в хранилище."""
+        directory = os.path.dirname(os.path.abspath(self.file_path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.state-',
+                                        suffix='.tmp')
         try:
-            prev_key, prev_val = self.retrieve_state().popitem()
-        except KeyError:
-            with open(self.file_path, 'w') as f:
+            with os.fdopen(fd, 'w') as f:
                 json.dump(state, f)
-        else:
-            if prev_val < state[prev_key]:
-                with open(self.file_path, 'w') as f:
-                    json.dump(state, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.file_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self._fsync_directory(directory)
 
     def retrieve_state(self) -> dict:
         """Получить состояние из хранилища."""
@@ -31,3 +40,14 @@ class JsonFileStorage(BaseStorage):
                 return json.load(f)
         except FileNotFoundError:
             return {}
+
+    @staticmethod
+    def _fsync_directory(directory: str) -> None:
+        """Зафиксировать переименование в каталоге (только POSIX)."""
+        if not hasattr(os, 'O_DIRECTORY'):
+            return
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
@@ -1,5 +1,9 @@
+import threading
 import uuid
-from typing import Any
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from time import monotonic
+from typing import Any, NamedTuple
 
 from pydantic import BaseModel
 
@@ -7,21 +11,95 @@ from .base_storage import BaseStorage
 
 
 class State:
-    """Класс для работы с состояниями."""
-
-    def __init__(self, storage: BaseStorage) -> None:
+    """Класс для работы с состояниями.
+
+    Состояние читается из хранилища один раз и дальше живёт в памяти.
+    Запись отложенная: изменения сбрасываются в хранилище не чаще
+    раза в flush_interval секунд и при явном вызове flush().
+    Запись и сброс защищены блокировкой: при конкурентном конвейере
+    отметки сохраняет поток загрузки.
+    """
+
+    def __init__(self, storage: BaseStorage,
+                 key_prefix: str = "last_movies_updated",
+                 flush_interval: float = 0) -> None:
         self.storage = storage
-        self.value = {}
+        self.key_prefix = key_prefix
+        self.flush_interval = flush_interval
+        self.value = storage.retrieve_state()
+        self._dirty = False
+        self._flushed_at = monotonic()
+        self._lock = threading.RLock()
 
     def set_state(self, key: str, value: Any) -> None:
         """Установить состояние для определённого ключа."""
-        state = {key: str(value)}
-        self.storage.save_state(state)
+        with self._lock:
+            if self.value.get(key) == value:
+                return
+            self.value[key] = value
+            self._dirty = True
+            if monotonic() - self._flushed_at >= self.flush_interval:
+                self.flush()
 
     def get_state(self, key: str) -> Any:
         """Получить состояние по определённому ключу."""
-        states = self.storage.retrieve_state()
-        return states.get(key)
+        return self.value.get(key)
+
+    def flush(self) -> None:
+        """Сбросить накопленные изменения в хранилище."""
+        with self._lock:
+            if self._dirty:
+                self.storage.save_state(dict(self.value))
+                self._dirty = False
+            self._flushed_at = monotonic()
+
+    def get_watermark(self, table: str) -> 'Watermark':
+        """Получить отметку таблицы. Для файла состояния старого формата
+        начинаем с общего ключа, который раньше был один на все таблицы."""
+        value = self.get_state(f"{self.key_prefix}:{table}")
+        if value:
+            return Watermark(*value)
+        return Watermark.initial(self.get_state(self.key_prefix))
+
+    def set_watermark(self, table: str, watermark: 'Watermark') -> None:
+        """Сохранить отметку таблицы независимо от остальных."""
+        self.set_state(f"{self.key_prefix}:{table}", list(watermark))
+
+
+class Watermark(NamedTuple):
+    """Составная отметка (updated_at, id) последней обработанной строки."""
+    updated_at: str
+    id: str
+
+    @classmethod
+    def from_row(cls, row) -> 'Watermark':
+        return cls(str(row['updated_at']), str(row['id']))
+
+    @classmethod
+    def initial(cls, updated_at: str | None = None) -> 'Watermark':
+        return cls(updated_at or str(datetime.min), str(uuid.UUID(int=0)))
+
+    def lag(self) -> float:
+        """Сколько секунд прошло с updated_at отметки."""
+        updated_at = datetime.fromisoformat(self.updated_at)
+        if updated_at.tzinfo is None:
+            updated_at = updated_at.replace(tzinfo=timezone.utc)
+        return (datetime.now(timezone.utc) - updated_at).total_seconds()
+
+
+class RawDocument(NamedTuple):
+    """Документ ES, уже закодированный в JSON на стороне Postgres."""
+    id: str
+    source: str
+
+
+@dataclass
+class Checkpoint:
+    """Отметка таблицы, которая сохраняется только после успешной
+    загрузки в ES всех документов, порождённых пачкой изменений."""
+    table: str
+    watermark: Watermark | None
+    failed: bool = False
 
 
 class UUIDMixIn(BaseModel):
@@ -58,3 +136,31 @@ class MovieRow(UUIDMixIn):
         self.directors_names = self._get_names(self.directors)
         self.actors_names = self._get_names(self.actors)
         self.writers_names = self._get_names(self.writers)
+
+    def to_document(self) -> dict:
+        """Документ для индекса movies."""
+        return {
+            "id": self.id,
+            "imdb_rating": self.imdb_rating,
+            "title": self.title,
+            "description": self.description,
+            "genre": self.genres_names,
+            "actors_names": self.actors_names,
+            "writers_names": self.writers_names,
+            "director": self.directors_names,
+            "actors": [dict(actor) for actor in self.actors],
+            "writers": [dict(writer) for writer in self.writers],
+        }
+
+
+class MovieDocument(UUIDMixIn):
+    """Схема документа индекса movies, собранного в SQL."""
+    imdb_rating: float | None
+    title: str
+    description: str | None
+    genre: list[str]
+    actors_names: list[str]
+    writers_names: list[str]
+    director: list[str]
+    actors: list[Person]
+    writers: list[Person]
@@ -0,0 +1,49 @@
+from psycopg2.extras import Json
+
+from .base_storage import BaseStorage
+
+
+class PostgresStorage(BaseStorage):
+    """Реализация хранилища в таблице Postgres.
+
+    Нужна, когда раздел может переехать в другой процесс или контейнер:
+    его отметки должны быть видны новому владельцу. Каждое хранилище
+    видит только строки своей области scope.
+    """
+
+    def __init__(self, connection, scope: str) -> None:
+        self.connection = connection
+        self.scope = scope
+
+    @staticmethod
+    def create_table(connection) -> None:
+        """Создаёт таблицу состояний. Вызывается один раз до запуска
+        процессов, чтобы они не создавали её наперегонки."""
+        with connection.cursor() as cursor:
+            cursor.execute('''
+            CREATE TABLE IF NOT EXISTS public.etl_state (
+                scope TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value JSONB NOT NULL,
+                PRIMARY KEY (scope, key)
+            )
+            ''')
+        connection.commit()
+
+    def save_state(self, state: dict) -> None:
+        """Сохранить состояние в хранилище."""
+        with self.connection.cursor() as cursor:
+            cursor.executemany('''
+            INSERT INTO public.etl_state (scope, key, value)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (scope, key) DO UPDATE SET value = excluded.value
+            ''', [(self.scope, key, Json(value))
+                  for key, value in state.items()])
+
+    def retrieve_state(self) -> dict:
+        """Получить состояние из хранилища."""
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT key, value FROM public.etl_state WHERE scope = %s',
+                (self.scope,))
+            return dict(cursor.fetchall())
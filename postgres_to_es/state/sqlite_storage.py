@@ -0,0 +1,38 @@
+import json
+import sqlite3
+
+from .base_storage import BaseStorage
+
+
+class SQLiteStorage(BaseStorage):
+    """Реализация хранилища в локальной базе SQLite.
+
+    Каждый ключ — отдельная строка, значения хранятся в JSON.
+    Запись идёт одной транзакцией в режиме WAL.
+    """
+
+    def __init__(self, db_path: str = "storage.sqlite") -> None:
+        self.db_path = db_path
+        # Сохранять может поток загрузки, доступ сериализует State.
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=FULL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS state '
+            '(key TEXT PRIMARY KEY, value TEXT NOT NULL)'
+        )
+        self.connection.commit()
+
+    def save_state(self, state: dict) -> None:
+        """Сохранить состояние в хранилище."""
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO state (key, value) VALUES (?, ?) '
+                'ON CONFLICT (key) DO UPDATE SET value = excluded.value',
+                [(key, json.dumps(value)) for key, value in state.items()]
+            )
+
+    def retrieve_state(self) -> dict:
+        """Получить состояние из хранилища."""
+        rows = self.connection.execute('SELECT key, value FROM state')
+        return {key: json.loads(value) for key, value in rows}
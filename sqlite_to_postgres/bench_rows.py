@@ -0,0 +1,82 @@
+"""Микробенчмарк представления строк: dataclass на строку против кортежей.
+
+Генерирует SQLite-файл с film_work на заданное число строк (по умолчанию
+1 000 000) и сравнивает чтение и подготовку параметров INSERT без Postgres.
+"""
+import argparse
+import os
+import sqlite3
+import time
+import tracemalloc
+import uuid
+from contextlib import closing
+
+from copy_bd import SQLiteLoader
+from data_clases import Filmwork
+from postgres_save import ROW_ADAPTERS, TupleAdapter
+
+
+def generate(path, rows):
+    with closing(sqlite3.connect(path)) as conn:
+        conn.execute(
+            'CREATE TABLE film_work (id TEXT PRIMARY KEY, title TEXT, '
+            'description TEXT, creation_date DATE, rating FLOAT, type TEXT, '
+            'created_at timestamp, updated_at timestamp)'
+        )
+        conn.executemany(
+            'INSERT INTO film_work VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            ((str(uuid.uuid4()), f'Movie {i}', f'Description {i}',
+              '2021-06-16', i % 100 / 10, 'movie',
+              '2021-06-16 20:14:09.221855+00',
+              '2021-06-16 20:14:09.221855+00') for i in range(rows))
+        )
+        conn.commit()
+
+
+def dataclass_path(loader):
+    adapter = ROW_ADAPTERS['film_work']
+    total = 0
+    for _, movies in loader.load_batches('film_work', Filmwork):
+        total += len([adapter(movie) for movie in movies])
+    return total
+
+
+def tuple_path(loader):
+    to_params = TupleAdapter(Filmwork)
+    total = 0
+    for _, rows in loader.load_tuple_batches('film_work', Filmwork):
+        total += len(to_params(rows))
+    return total
+
+
+def measure(name, func, loader):
+    started = time.perf_counter()
+    total = func(loader)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    func(loader)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f'{name:>9}: {total} rows in {elapsed:.2f}s '
+          f'({total / elapsed:,.0f} rows/s), '
+          f'peak memory {peak / 2 ** 20:.1f} MiB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--path', default='bench_rows.sqlite')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        generate(args.path, args.rows)
+    loader = SQLiteLoader(args.path, args.batch_size)
+    measure('dataclass', dataclass_path, loader)
+    measure('tuple', tuple_path, loader)
+
+
+if __name__ == '__main__':
+    main()
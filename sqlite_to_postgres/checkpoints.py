@@ -0,0 +1,58 @@
+from psycopg2.extensions import connection as _connection
+
+
+class Checkpoints:
+    """Контрольные точки загрузки по таблицам.
+
+    Хранятся в самом Postgres и записываются в той же транзакции,
+    что и пачка данных, поэтому не могут разойтись с загруженными строками.
+    """
+
+    def __init__(self, pg_conn: _connection):
+        self.pg_conn = pg_conn
+        with self.pg_conn.cursor() as pg_cursor:
+            pg_cursor.execute(
+                """
+                CREATE TABLE IF NOT EXISTS public.sqlite_load_checkpoint (
+                    table_name TEXT PRIMARY KEY,
+                    last_rowid BIGINT NOT NULL DEFAULT 0,
+                    batches INTEGER NOT NULL DEFAULT 0,
+                    done BOOLEAN NOT NULL DEFAULT FALSE
+                )
+                """
+            )
+        self.pg_conn.commit()
+
+    def get(self, table):
+        with self.pg_conn.cursor() as pg_cursor:
+            pg_cursor.execute(
+                """
+                SELECT last_rowid, batches, done
+                FROM public.sqlite_load_checkpoint
+                WHERE table_name = %s
+                """,
+                (table,)
+            )
+            row = pg_cursor.fetchone()
+        return tuple(row) if row else (0, 0, False)
+
+    @staticmethod
+    def save(pg_cursor, table, last_rowid=0, batches=0, done=False):
+        """Записать точку в текущей транзакции курсора."""
+        pg_cursor.execute(
+            """
+            INSERT INTO public.sqlite_load_checkpoint
+                (table_name, last_rowid, batches, done)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (table_name) DO UPDATE
+            SET last_rowid = EXCLUDED.last_rowid,
+                batches = EXCLUDED.batches,
+                done = EXCLUDED.done
+            """,
+            (table, last_rowid, batches, done)
+        )
+
+    def clear(self):
+        with self.pg_conn.cursor() as pg_cursor:
+            pg_cursor.execute('DELETE FROM public.sqlite_load_checkpoint')
+        self.pg_conn.commit()
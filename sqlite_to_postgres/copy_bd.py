@@ -1,6 +1,6 @@
 import sqlite3
 from contextlib import contextmanager
-from data_clases import Filmwork, Genre, GenreFilmWork, Person, PersonFilmWork
+from dataclasses import fields
 
 
 class SQLiteLoader:
@@ -16,33 +16,32 @@ class SQLiteLoader:
         yield conn, curs
         conn.close()
 
-    def load_table(self, table_name, data_class):
+    def load_batches(self, table_name, data_class, after_rowid=0):
+        """Пачки (последний rowid, объекты) начиная после after_rowid."""
         with self.conn_context() as (conn, curs):
-            curs.execute(f"SELECT * FROM {table_name};")
+            curs.execute(
+                f"SELECT rowid AS rowid_, * FROM {table_name} "
+                f"WHERE rowid > ? ORDER BY rowid;",
+                (after_rowid,)
+            )
             while (rows := curs.fetchmany(self.batch_size)):
+                items = []
                 for row in rows:
-                    item = data_class(**dict(row))
-                    yield item
-
-    def load_movies(self):
-        return self.load_table("film_work", Filmwork)
-
-    def load_genres(self):
-        return self.load_table("genre", Genre)
-
-    def load_persons(self):
-        return self.load_table("person", Person)
-
-    def load_genre_film_work(self):
-        return self.load_table("genre_film_work", GenreFilmWork)
-
-    def load_person_film_work(self):
-        return self.load_table("person_film_work", PersonFilmWork)
-
-    def load_data(self):
-        movies = list(self.load_movies())
-        genres = list(self.load_genres())
-        persons = list(self.load_persons())
-        genre_film_works = list(self.load_genre_film_work())
-        person_film_works = list(self.load_person_film_work())
-        return movies, genres, persons, genre_film_works, person_film_works
+                    item = dict(row)
+                    last_rowid = item.pop('rowid_')
+                    items.append(data_class(**item))
+                yield last_rowid, items
+
+    def load_tuple_batches(self, table_name, data_class, after_rowid=0):
+        """Быстрый путь: пачки строк-кортежей в порядке полей dataclass,
+        без dict и объекта на каждую строку."""
+        columns = ', '.join(field.name for field in fields(data_class))
+        with self.conn_context() as (conn, curs):
+            curs.row_factory = None
+            curs.execute(
+                f"SELECT rowid, {columns} FROM {table_name} "
+                f"WHERE rowid > ? ORDER BY rowid;",
+                (after_rowid,)
+            )
+            while (rows := curs.fetchmany(self.batch_size)):
+                yield rows[-1][0], [row[1:] for row in rows]
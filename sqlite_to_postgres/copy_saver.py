@@ -0,0 +1,137 @@
+import csv
+import io
+import logging
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from dataclasses import fields
+
+import psycopg2
+
+from checkpoints import Checkpoints
+from data_clases import TABLES
+
+logger = logging.getLogger(__name__)
+
+# Таблицы внутри одного этапа независимы и грузятся параллельно,
+# таблицы связей ждут окончания загрузки своих внешних ключей.
+LOAD_STAGES = (
+    ('film_work', 'genre', 'person'),
+    ('genre_film_work', 'person_film_work'),
+)
+
+NULL = '\\N'
+
+
+class IteratorFile(io.TextIOBase):
+    """Файлоподобный объект поверх генератора строк для COPY FROM STDIN."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._current = ''
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        parts = []
+        while size != 0:
+            if self._pos >= len(self._current):
+                self._current = next(self._chunks, None)
+                self._pos = 0
+                if self._current is None:
+                    self._current = ''
+                    break
+            end = len(self._current) if size < 0 else self._pos + size
+            part = self._current[self._pos:end]
+            self._pos += len(part)
+            if size > 0:
+                size -= len(part)
+            parts.append(part)
+        return ''.join(parts)
+
+
+class CopyPostgresSaver:
+    """Потоковая загрузка таблиц SQLite в Postgres через COPY.
+
+    Каждая таблица читается пачками fetchmany и сразу уходит в COPY
+    во временную таблицу, после чего сливается в content
+    с ON CONFLICT DO NOTHING. Таблица загружается одной транзакцией,
+    поэтому при перезапуске пропускаются только полностью загруженные.
+    """
+
+    def __init__(self, db_path, dsl, batch_size, workers=3):
+        self.db_path = db_path
+        self.dsl = dsl
+        self.batch_size = batch_size
+        self.workers = workers
+
+    @staticmethod
+    def columns(table):
+        return [field.name for field in fields(TABLES[table])]
+
+    def iter_csv(self, curs, stats):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        while rows := curs.fetchmany(self.batch_size):
+            writer.writerows(
+                [NULL if value is None else value for value in row]
+                for row in rows
+            )
+            stats['rows'] += len(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    def copy_table(self, table):
+        columns = ', '.join(self.columns(table))
+        stats = {'rows': 0}
+        started = time.perf_counter()
+
+        with closing(sqlite3.connect(self.db_path)) as sqlite_conn, \
+                closing(psycopg2.connect(**self.dsl)) as pg_conn:
+            sqlite_curs = sqlite_conn.cursor()
+            sqlite_curs.execute(f'SELECT {columns} FROM {table};')
+            with pg_conn.cursor() as pg_cursor:
+                pg_cursor.execute(
+                    f'CREATE TEMP TABLE tmp_{table} '
+                    f'(LIKE content.{table}) ON COMMIT DROP'
+                )
+                pg_cursor.copy_expert(
+                    f"COPY tmp_{table} ({columns}) FROM STDIN "
+                    f"WITH (FORMAT csv, NULL '{NULL}')",
+                    IteratorFile(self.iter_csv(sqlite_curs, stats)),
+                    size=64 * 1024,
+                )
+                pg_cursor.execute(
+                    f'INSERT INTO content.{table} ({columns}) '
+                    f'SELECT {columns} FROM tmp_{table} '
+                    f'ON CONFLICT DO NOTHING'
+                )
+                inserted = pg_cursor.rowcount
+                Checkpoints.save(pg_cursor, table, done=True)
+            pg_conn.commit()
+
+        elapsed = time.perf_counter() - started
+        logger.info('%s: %d rows read, %d inserted in %.2fs (%.0f rows/s)',
+                    table, stats['rows'], inserted, elapsed,
+                    stats['rows'] / elapsed if elapsed else 0)
+        return table, stats['rows'], elapsed
+
+    def save_data(self):
+        report = []
+        with closing(psycopg2.connect(**self.dsl)) as pg_conn:
+            checkpoints = Checkpoints(pg_conn)
+            with ThreadPoolExecutor(max_workers=self.workers) as executor:
+                for stage in LOAD_STAGES:
+                    pending = []
+                    for table in stage:
+                        if checkpoints.get(table)[2]:
+                            logger.info('%s: already loaded, skipping', table)
+                        else:
+                            pending.append(table)
+                    report.extend(executor.map(self.copy_table, pending))
+            checkpoints.clear()
+        return report
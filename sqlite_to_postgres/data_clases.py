@@ -48,3 +48,12 @@ class PersonFilmWork:
     film_work_id: uuid.UUID = field(default_factory=uuid.uuid4)
     role: str = ""
     created_at: Optional[datetime] = None
+
+
+TABLES = {
+    'film_work': Filmwork,
+    'genre': Genre,
+    'person': Person,
+    'genre_film_work': GenreFilmWork,
+    'person_film_work': PersonFilmWork,
+}
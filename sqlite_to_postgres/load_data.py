@@ -1,28 +1,83 @@
+import argparse
+import logging
 import sqlite3
+import sys
 import psycopg2
 from psycopg2.extensions import connection as _connection
 from psycopg2.extras import DictCursor
+from checkpoints import Checkpoints
 from copy_bd import SQLiteLoader
-from postgres_save import PostgresSaver
-from variables import batch_size, db_path
+from copy_saver import CopyPostgresSaver
+from data_clases import TABLES
+from postgres_save import PostgresSaver, TupleAdapter
+from verify import verify
+from variables import batch_size, db_path, workers
 import os
 from dotenv import load_dotenv, find_dotenv
 from contextlib import closing
 
 load_dotenv(find_dotenv())
 
+logging.basicConfig(level=logging.INFO,
+                    format='%(asctime)s - %(levelname)s: %(message)s')
 
-def load_from_sqlite(connection: sqlite3.Connection, pg_conn: _connection):
-    """Основной метод загрузки данных из SQLite в Postgres"""
-    sqlite_loader = SQLiteLoader(db_path, batch_size)
-    postgres_saver = PostgresSaver(pg_conn, batch_size)
-    (movies, genres, persons, genre_film_works,
-     person_film_works) = sqlite_loader.load_data()
-    postgres_saver.save_data(movies, genres, persons,
-                             genre_film_works, person_film_works)
+logger = logging.getLogger(__name__)
+
+
+def load_from_sqlite(connection: sqlite3.Connection, pg_conn: _connection,
+                     rows: str = 'dataclass', path: str = db_path):
+    """Основной метод загрузки данных из SQLite в Postgres.
+
+    После каждой пачки сохраняется контрольная точка, поэтому
+    прерванная загрузка продолжается с последней зафиксированной пачки.
+    """
+    sqlite_loader = SQLiteLoader(path, batch_size)
+    postgres_saver = PostgresSaver(pg_conn)
+    checkpoints = Checkpoints(pg_conn)
+    for table, data_class in TABLES.items():
+        last_rowid, batch_number, done = checkpoints.get(table)
+        if done:
+            logger.info('%s: already loaded, skipping', table)
+            continue
+        if last_rowid:
+            logger.info('%s: resuming after rowid %d (batch %d)',
+                        table, last_rowid, batch_number)
+        if rows == 'tuple':
+            batches = sqlite_loader.load_tuple_batches(table, data_class,
+                                                       last_rowid)
+            to_params = TupleAdapter(data_class)
+        else:
+            batches = sqlite_loader.load_batches(table, data_class,
+                                                 last_rowid)
+            to_params = None
+        postgres_saver.save_batches(table, batches, checkpoints,
+                                    last_rowid, batch_number, to_params)
+    checkpoints.clear()
+
+
+def copy_from_sqlite(dsl: dict, workers: int = workers, path: str = db_path):
+    """Потоковая загрузка через COPY, независимые таблицы — параллельно"""
+    return CopyPostgresSaver(path, dsl, batch_size, workers).save_data()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Перенос данных из SQLite в Postgres')
+    parser.add_argument('--mode', choices=('insert', 'copy'),
+                        default='insert')
+    parser.add_argument('--workers', type=int, default=workers)
+    parser.add_argument('--rows', choices=('dataclass', 'tuple'),
+                        default='dataclass',
+                        help='представление строк в режиме insert')
+    parser.add_argument('--restart', action='store_true',
+                        help='сбросить контрольные точки и начать заново')
+    parser.add_argument('--verify', action='store_true',
+                        help='только сверить SQLite и Postgres')
+    return parser.parse_args()
 
 
 if __name__ == '__main__':
+    args = parse_args()
     dsl = {
         'dbname': os.getenv("PG_NAME"),
         'user': os.getenv("PG_USER"),
@@ -30,7 +85,14 @@ if __name__ == '__main__':
         'host': os.getenv("PG_HOST"),
         'port': os.getenv("PG_PORT")
     }
-    with closing(sqlite3.connect('db.sqlite')) as sqlite_conn, (
-            closing(psycopg2.connect(**dsl,
-                                     cursor_factory=DictCursor))) as pg_conn:
-        load_from_sqlite(sqlite_conn, pg_conn)
+    with closing(sqlite3.connect(db_path)) as sqlite_conn, (
+            closing(psycopg2.connect(
+                **dsl, cursor_factory=DictCursor))) as pg_conn:
+        if args.verify:
+            sys.exit(0 if verify(sqlite_conn, pg_conn) else 1)
+        if args.restart:
+            Checkpoints(pg_conn).clear()
+        if args.mode == 'copy':
+            copy_from_sqlite(dsl, args.workers)
+        else:
+            load_from_sqlite(sqlite_conn, pg_conn, args.rows)
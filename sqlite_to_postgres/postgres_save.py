@@ -1,130 +1,123 @@
+import uuid
+from dataclasses import fields
+
 from psycopg2.extensions import connection as _connection
 
+from checkpoints import Checkpoints
 
-class PostgresSaver:
-    def __init__(self, pg_conn: _connection, batch_size):
-        self.pg_conn = pg_conn
-        self.batch_size = batch_size
+INSERT_QUERIES = {
+    'film_work': """
+        INSERT INTO content.film_work (id, title, description,
+        creation_date, rating, type, created_at, updated_at)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (id) DO NOTHING
+        """,
+    'genre': """
+        INSERT INTO content.genre (id, name, description,
+        created_at, updated_at)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (id) DO NOTHING
+        """,
+    'person': """
+        INSERT INTO content.person (id, full_name,
+        created_at, updated_at)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (id) DO NOTHING
+        """,
+    'genre_film_work': """
+        INSERT INTO content.genre_film_work (id, genre_id,
+        film_work_id, created_at)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (id) DO NOTHING
+        """,
+    'person_film_work': """
+        INSERT INTO content.person_film_work (id, person_id,
+        film_work_id, role, created_at)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (id) DO NOTHING
+        """,
+}
 
-    def save_movies(self, movies):
-        movie_chunks = [movies[i:i + self.batch_size] for i in (
-            range(0, len(movies), self.batch_size))]
+ROW_ADAPTERS = {
+    'film_work': lambda movie: (
+        str(movie.id), movie.title, movie.description,
+        movie.creation_date, movie.rating, movie.type,
+        movie.created_at, movie.updated_at),
+    'genre': lambda genre: (
+        str(genre.id), genre.name, genre.description,
+        genre.created_at, genre.updated_at),
+    'person': lambda person: (
+        str(person.id), person.full_name, person.created_at,
+        person.updated_at),
+    'genre_film_work': lambda genre_film_work: (
+        str(genre_film_work.id),
+        str(genre_film_work.genre_id),
+        str(genre_film_work.film_work_id),
+        genre_film_work.created_at),
+    'person_film_work': lambda person_film_work: (
+        str(person_film_work.id),
+        str(person_film_work.person_id),
+        str(person_film_work.film_work_id),
+        person_film_work.role,
+        person_film_work.created_at),
+}
 
-        with self.pg_conn.cursor() as pg_cursor:
-            for movie_chunk in movie_chunks:
-                pg_cursor.executemany(
-                    """
-                    INSERT INTO content.film_work (id, title, description,
-                    creation_date, rating, type, created_at, updated_at)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                    ON CONFLICT (id) DO NOTHING
-                    """,
-                    [
-                        (str(movie.id), movie.title, movie.description,
-                         movie.creation_date, movie.rating, movie.type,
-                         movie.created_at, movie.updated_at)
-                        for movie in movie_chunk
-                    ]
-                )
-        self.pg_conn.commit()
 
-    def save_genres(self, genres):
-        genre_chunks = [genres[i:i + self.batch_size] for i in (
-            range(0, len(genres), self.batch_size))]
+class TupleAdapter:
+    """Приводит строки-кортежи к параметрам запроса.
 
-        with self.pg_conn.cursor() as pg_cursor:
-            for genre_chunk in genre_chunks:
-                pg_cursor.executemany(
-                    """
-                    INSERT INTO content.genre (id, name, description,
-                    created_at, updated_at)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT (id) DO NOTHING
-                    """,
-                    [
-                        (str(genre.id), genre.name, genre.description,
-                         genre.created_at, genre.updated_at)
-                        for genre in genre_chunk
-                    ]
-                )
-        self.pg_conn.commit()
+    Нужные преобразования определяются один раз по первой строке для
+    каждой колонки: если UUID уже пришли строками, строки передаются как есть.
+    """
 
-    def save_persons(self, persons):
-        person_chunks = [persons[i:i + self.batch_size] for i in (
-            range(0, len(persons), self.batch_size))]
+    def __init__(self, data_class):
+        self.uuid_columns = [index for index, field in
+                             enumerate(fields(data_class))
+                             if field.type is uuid.UUID]
+        self.adapters = None
 
-        with self.pg_conn.cursor() as pg_cursor:
-            for person_chunk in person_chunks:
-                pg_cursor.executemany(
-                    """
-                    INSERT INTO content.person (id, full_name,
-                    created_at, updated_at)
-                    VALUES (%s, %s, %s, %s)
-                    ON CONFLICT (id) DO NOTHING
-                    """,
-                    [
-                        (str(person.id), person.full_name, person.created_at,
-                         person.updated_at)
-                        for person in person_chunk
-                    ]
-                )
-        self.pg_conn.commit()
+    def __call__(self, rows):
+        if self.adapters is None:
+            self.adapters = [
+                (index, str) for index in self.uuid_columns
+                if not isinstance(rows[0][index], (str, type(None)))
+            ]
+        if not self.adapters:
+            return rows
+        adapted = []
+        for row in rows:
+            row = list(row)
+            for index, adapter in self.adapters:
+                if row[index] is not None:
+                    row[index] = adapter(row[index])
+            adapted.append(row)
+        return adapted
 
-    def save_genre_film_work(self, genre_film_works):
-        genre_film_work_chunks = (
-            [genre_film_works[i:i + self.batch_size] for i in (
-                range(0, len(genre_film_works), self.batch_size))]
-        )
 
-        with self.pg_conn.cursor() as pg_cursor:
-            for genre_film_work_chunk in genre_film_work_chunks:
-                pg_cursor.executemany(
-                    """
-                    INSERT INTO content.genre_film_work (id, genre_id,
-                    film_work_id, created_at)
-                    VALUES (%s, %s, %s, %s)
-                    ON CONFLICT (id) DO NOTHING
-                    """,
-                    [
-                        (str(genre_film_work.id),
-                         str(genre_film_work.genre_id),
-                         str(genre_film_work.film_work_id),
-                         genre_film_work.created_at)
-                        for genre_film_work in genre_film_work_chunk
-                    ]
-                )
-        self.pg_conn.commit()
+class PostgresSaver:
+    def __init__(self, pg_conn: _connection):
+        self.pg_conn = pg_conn
+
+    def save_batches(self, table, batches, checkpoints: Checkpoints,
+                     last_rowid=0, batch_number=0, to_params=None):
+        """Сохраняет пачки (last_rowid, items), фиксируя контрольную
+        точку в той же транзакции, что и каждую пачку."""
+        if to_params is None:
+            adapter = ROW_ADAPTERS[table]
 
-    def save_person_film_work(self, person_film_works):
-        person_film_work_chunks = (
-            [person_film_works[i:i + self.batch_size] for i in (
-                range(0, len(person_film_works), self.batch_size))]
-        )
+            def to_params(items):
+                return [adapter(item) for item in items]
+
+        for last_rowid, items in batches:
+            batch_number += 1
+            with self.pg_conn.cursor() as pg_cursor:
+                pg_cursor.executemany(INSERT_QUERIES[table],
+                                      to_params(items))
+                checkpoints.save(pg_cursor, table, last_rowid, batch_number)
+            self.pg_conn.commit()
 
         with self.pg_conn.cursor() as pg_cursor:
-            for person_film_work_chunk in person_film_work_chunks:
-                pg_cursor.executemany(
-                    """
-                    INSERT INTO content.person_film_work (id, person_id,
-                    film_work_id, role, created_at)
-                    VALUES (%s, %s, %s, %s, %s)
-                    ON CONFLICT (id) DO NOTHING
-                    """,
-                    [
-                        (str(person_film_work.id),
-                         str(person_film_work.person_id),
-                         str(person_film_work.film_work_id),
-                         person_film_work.role,
-                         person_film_work.created_at)
-                        for person_film_work in person_film_work_chunk
-                    ]
-                )
+            checkpoints.save(pg_cursor, table, last_rowid, batch_number,
+                             done=True)
         self.pg_conn.commit()
-
-    def save_data(self, movies, genres, persons,
-                  genre_film_works, person_film_works):
-        self.save_movies(movies)
-        self.save_genres(genres)
-        self.save_persons(persons)
-        self.save_genre_film_work(genre_film_works)
-        self.save_person_film_work(person_film_works)
+        return batch_number
@@ -1,2 +1,3 @@
 batch_size = 1000
 db_path = 'db.sqlite'
+workers = 3
@@ -0,0 +1,88 @@
+import hashlib
+import logging
+import sqlite3
+
+from psycopg2.extensions import connection as _connection
+
+logger = logging.getLogger(__name__)
+
+# Колонки, по которым считается контрольная сумма. Метки времени
+# не сравниваются: их текстовое представление в SQLite и Postgres разное.
+CHECKSUM_COLUMNS = {
+    'film_work': ('id', 'title', 'description', 'creation_date', 'rating',
+                  'type'),
+    'genre': ('id', 'name', 'description'),
+    'person': ('id', 'full_name'),
+    'genre_film_work': ('id', 'genre_id', 'film_work_id'),
+    'person_film_work': ('id', 'person_id', 'film_work_id', 'role'),
+}
+FLOAT_COLUMNS = {'rating'}
+
+CHUNKS_SQL = "SELECT {columns} FROM {table} ORDER BY id"
+
+
+def _formatter(column):
+    if column in FLOAT_COLUMNS:
+        return lambda value: f'{float(value):.2f}'
+    return str
+
+
+def checksum_chunks(rows, columns, chunk_size):
+    """Число строк и md5 по кускам из chunk_size упорядоченных строк.
+    Одна функция для обеих СУБД: склейка и округление не зависят
+    от GROUP_CONCAT, PRINTF и ROUND."""
+    formatters = [_formatter(column) for column in columns]
+    chunks = {}
+    for number, row in enumerate(rows):
+        chunk = chunks.setdefault(number // chunk_size, [0, hashlib.md5()])
+        chunk[0] += 1
+        line = '|'.join('' if value is None else formatter(value)
+                        for formatter, value in zip(formatters, row))
+        chunk[1].update(line.encode() + b'\n')
+    return {number: (count, digest.hexdigest())
+            for number, (count, digest) in chunks.items()}
+
+
+def sqlite_chunks(connection: sqlite3.Connection, table, chunk_size):
+    columns = CHECKSUM_COLUMNS[table]
+    curs = connection.execute(
+        CHUNKS_SQL.format(columns=', '.join(columns), table=table))
+    return checksum_chunks(curs, columns, chunk_size)
+
+
+def pg_chunks(pg_conn: _connection, table, chunk_size):
+    columns = CHECKSUM_COLUMNS[table]
+    # Именованный курсор: строки приходят с сервера порциями.
+    with pg_conn.cursor(name=f'verify_{table}') as pg_cursor:
+        pg_cursor.itersize = chunk_size
+        pg_cursor.execute(CHUNKS_SQL.format(columns=', '.join(columns),
+                                            table=f'content.{table}'))
+        chunks = checksum_chunks(pg_cursor, columns, chunk_size)
+    pg_conn.rollback()
+    return chunks
+
+
+def verify(connection: sqlite3.Connection, pg_conn: _connection,
+           chunk_size=10000):
+    """Сверяет число строк и контрольные суммы по упорядоченным по id
+    кускам таблиц. Строки читаются потоком с обеих сторон, в памяти
+    держатся только хеши кусков. Порядок uuid в Postgres совпадает
+    с порядком их текста в нижнем регистре в SQLite."""
+    ok = True
+    for table in CHECKSUM_COLUMNS:
+        source = sqlite_chunks(connection, table, chunk_size)
+        target = pg_chunks(pg_conn, table, chunk_size)
+        source_rows = sum(count for count, _ in source.values())
+        target_rows = sum(count for count, _ in target.values())
+        mismatched = sorted(
+            chunk for chunk in source.keys() | target.keys()
+            if source.get(chunk) != target.get(chunk)
+        )
+        if mismatched:
+            ok = False
+            logger.error('%s: %d rows in SQLite, %d in Postgres, '
+                         'mismatched chunks: %s', table, source_rows,
+                         target_rows, mismatched)
+        else:
+            logger.info('%s: %d rows, checksums match', table, source_rows)
+    return ok